@@ -0,0 +1,151 @@
+"""Stand-in for MicroPython's machine module on CPython.
+
+ADC readings and digital inputs come from signal functions of time (in
+seconds since start), registered per pin number in `analog_signals` and
+`digital_signals`. By default they simulate the joystick module wired as
+in transmitter/main.py, slowly circling around its rest position with some
+ADC noise, with the button pressed briefly every few seconds.
+"""
+
+import math
+import random
+import threading
+import time
+
+_start = time.monotonic()
+
+
+def now():
+    return time.monotonic() - _start
+
+
+def joystick_axis(rest, amplitude, period_s, phase=0, noise=150):
+    """Axis moving sinusoidally around its rest value, with gaussian noise"""
+    def signal(t):
+        value = rest + amplitude * math.sin(2 * math.pi * t / period_s + phase)
+        value += random.gauss(0, noise)
+        return min(max(int(value), 0), 65535)
+    return signal
+
+
+def button(period_s, press_s, delay_s=1):
+    """Active low button, pressed for press_s every period_s"""
+    def signal(t):
+        if t < delay_s:
+            return 1
+        return 0 if (t - delay_s) % period_s < press_s else 1
+    return signal
+
+
+analog_signals = {
+    27: joystick_axis(31500, 30000, 8),
+    26: joystick_axis(34000, 30000, 8, math.pi / 2),
+}
+digital_signals = {
+    22: button(3, 0.1),
+}
+
+# interrupts are emulated by a thread polling pins with IRQ handlers, which
+# holds this lock while calling them, so disable_irq() blocks handlers
+_irq_lock = threading.RLock()
+_irq_pins = []
+_irq_thread = None
+
+
+def disable_irq():
+    _irq_lock.acquire()
+    return 0
+
+
+def enable_irq(state=0):
+    _irq_lock.release()
+
+
+def _irq_loop():
+    while True:
+        time.sleep(0.001)
+        with _irq_lock:
+            for pin in list(_irq_pins):
+                value = pin.value()
+                if value == pin._irq_last:
+                    continue
+                pin._irq_last = value
+                if value and pin._irq_trigger & Pin.IRQ_RISING or \
+                        not value and pin._irq_trigger & Pin.IRQ_FALLING:
+                    pin._irq_handler(pin)
+
+
+class Pin():
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=IN, pull=None, value=None):
+        self.id = id
+        self.mode = mode
+        self.pull = pull
+        self._value = value if value is not None else 0
+        self._irq_handler = None
+
+    def value(self, value=None):
+        if value is not None:
+            self._value = int(bool(value))
+            return
+        if self.mode == Pin.OUT:
+            return self._value
+        if self.id in digital_signals:
+            return digital_signals[self.id](now())
+        return 1 if self.pull == Pin.PULL_UP else 0
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        global _irq_thread
+        with _irq_lock:
+            if self in _irq_pins:
+                _irq_pins.remove(self)
+            self._irq_handler = handler
+            self._irq_trigger = trigger
+            self._irq_last = self.value()
+            if handler is not None:
+                _irq_pins.append(self)
+        if _irq_thread is None:
+            _irq_thread = threading.Thread(target=_irq_loop, daemon=True)
+            _irq_thread.start()
+
+    def __repr__(self):
+        return 'Pin({})'.format(self.id)
+
+
+class ADC():
+
+    def __init__(self, pin):
+        self.id = pin.id if isinstance(pin, Pin) else pin
+
+    def read_u16(self):
+        if self.id in analog_signals:
+            return analog_signals[self.id](now())
+        return 0
+
+
+def freq(hz=None):
+    return 150000000
+
+
+def unique_id():
+    return b'\xe6\x61\x41\x04\x03\x2f\x6c\x2a'
+
+
+def reset():
+    raise SystemExit('machine.reset()')
@@ -0,0 +1,97 @@
+"""Stand-in for MicroPython's network module on CPython.
+
+Both interfaces use the loopback address, so a transmitter and a receiver
+started on the same machine talk to each other. The list of stations
+connected to the access point follows `station_script`, a list of
+(seconds since start, list of stations) steps.
+"""
+
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+
+_start = time.monotonic()
+_hostname = 'PicoW'
+
+# a receiver connects after 2 seconds, drops out and comes back later
+station_script = [
+    (0, []),
+    (2, [(b'\x28\xcd\xc1\x0f\x5a\x01',)]),
+    (60, []),
+    (65, [(b'\x28\xcd\xc1\x0f\x5a\x01',)]),
+]
+
+# seconds it takes a station interface to connect
+connect_delay = 1
+
+
+def hostname(name=None):
+    global _hostname
+    if name is None:
+        return _hostname
+    _hostname = name
+
+
+class WLAN():
+
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._active = False
+        self._config = {'ssid': '', 'key': '', 'channel': 1,
+                        'mac': b'\x28\xcd\xc1\x0f\x5a' + bytes([interface_id])}
+        self._connect_time = None
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self._connect_time = None
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config[args[0]]
+        self._config.update(kwargs)
+
+    def ifconfig(self, config=None):
+        if config is not None:
+            return
+        return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        self._config['ssid'] = ssid
+        self._config['key'] = key
+        self._connect_time = time.monotonic() + connect_delay
+
+    def disconnect(self):
+        self._connect_time = None
+
+    def isconnected(self):
+        if self.interface_id == AP_IF:
+            return self._active
+        return self._active and self._connect_time is not None and \
+            time.monotonic() >= self._connect_time
+
+    def status(self, param=None):
+        if param == 'stations':
+            if self.interface_id != AP_IF or not self._active:
+                return []
+            t = time.monotonic() - _start
+            stations = []
+            for step_time, step_stations in station_script:
+                if t >= step_time:
+                    stations = step_stations
+            return list(stations)
+        if param == 'rssi':
+            return -40
+        if self.isconnected():
+            return STAT_GOT_IP
+        return STAT_CONNECTING if self._connect_time else STAT_IDLE
+
+    def scan(self):
+        return [(b'Pico transmitter', b'\x28\xcd\xc1\x0f\x5a\x01', 1, -40, 3, 0)]
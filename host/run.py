@@ -0,0 +1,107 @@
+"""Run a board's program on CPython, using the machine and network
+stand-ins from this directory.
+
+    python host/run.py transmitter
+    python host/run.py receiver
+    python host/run.py transmitter bench.py
+
+Like on the board, boot.py runs first and then main.py (or the given
+script), with the board's directory as the working directory and first on
+the import path. Start both in separate terminals to have them talk over
+loopback.
+"""
+
+import asyncio
+import os
+import runpy
+import sys
+import time
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(HOST_DIR)
+
+_start_ns = time.perf_counter_ns()
+_TICKS_PERIOD = 1 << 30
+
+
+def _ticks(scale):
+    def ticks():
+        return ((time.perf_counter_ns() - _start_ns) // scale) % _TICKS_PERIOD
+    return ticks
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % _TICKS_PERIOD
+
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) % _TICKS_PERIOD
+    if diff >= _TICKS_PERIOD // 2:
+        diff -= _TICKS_PERIOD
+    return diff
+
+
+def install_time():
+    """Add MicroPython's time functions to the time module"""
+    time.ticks_ms = _ticks(1000000)
+    time.ticks_us = _ticks(1000)
+    time.ticks_cpu = _ticks(1)
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+
+def install_asyncio():
+    """Add the MicroPython specific asyncio functions and stream methods
+    used by the bundled microdot and aiohttp"""
+    async def sleep_ms(ms):
+        await asyncio.sleep(ms / 1000)
+
+    async def reader_aclose(self):
+        # in MicroPython reader and writer are the same stream object,
+        # closing either closes the connection
+        if self._transport is not None:
+            self._transport.close()
+
+    async def writer_awrite(self, data):
+        self.write(data)
+        await self.drain()
+
+    async def writer_aclose(self):
+        self.close()
+        await self.wait_closed()
+
+    open_connection = asyncio.open_connection
+
+    async def open_connection_keep_writer(*args, **kwargs):
+        reader, writer = await open_connection(*args, **kwargs)
+        # callers may keep just the reader, don't let the writer be garbage
+        # collected, as that closes the connection
+        reader._writer = writer
+        return reader, writer
+
+    asyncio.sleep_ms = sleep_ms
+    asyncio.open_connection = open_connection_keep_writer
+    asyncio.StreamReader.aclose = reader_aclose
+    asyncio.StreamWriter.awrite = writer_awrite
+    asyncio.StreamWriter.aclose = writer_aclose
+
+
+def run(board, script='main.py'):
+    board_dir = os.path.join(ROOT_DIR, board)
+    if not os.path.exists(os.path.join(board_dir, script)):
+        raise SystemExit('No {} in {}'.format(script, board_dir))
+    install_time()
+    install_asyncio()
+    sys.path[:0] = [board_dir, HOST_DIR]
+    os.chdir(board_dir)
+    if os.path.exists('boot.py'):
+        runpy.run_path('boot.py', run_name='__main__')
+    runpy.run_path(script, run_name='__main__')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        raise SystemExit(__doc__)
+    run(*sys.argv[1:])
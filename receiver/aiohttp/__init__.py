@@ -195,12 +195,13 @@ class ClientSession:
         if "Host" not in headers:
             headers.update(Host=host)
         if not data:
-            query = b"%s /%s %s\r\n%s\r\n" % (
+            # format as str and encode, bytes % str only works in MicroPython
+            query = ("%s /%s %s\r\n%s\r\n" % (
                 method,
                 path,
                 version,
                 "\r\n".join(f"{k}: {v}" for k, v in headers.items()) + "\r\n" if headers else "",
-            )
+            )).encode()
         else:
             if json:
                 headers.update(**{"Content-Type": "application/json"})
@@ -210,13 +211,12 @@ class ClientSession:
                 data = data.encode()
 
             headers.update(**{"Content-Length": len(data)})
-            query = b"""%s /%s %s\r\n%s\r\n%s""" % (
+            query = ("%s /%s %s\r\n%s\r\n" % (
                 method,
                 path,
                 version,
                 "\r\n".join(f"{k}: {v}" for k, v in headers.items()) + "\r\n",
-                data,
-            )
+            )).encode() + data
         if not is_handshake:
             await writer.awrite(query)
             return reader
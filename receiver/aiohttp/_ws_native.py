@@ -0,0 +1,10 @@
+# Viper variant of the websocket masking loop, used by aiohttp_ws when the
+# firmware supports the native code emitters
+
+import micropython
+
+
+@micropython.viper
+def mask_inplace(buf: ptr8, n: int, mask: ptr8):
+    for i in range(n):
+        buf[i] ^= mask[i & 3]
@@ -11,6 +11,24 @@ import re
 import struct
 from collections import namedtuple
 
+
+def _mask_inplace_py(buf, n, mask):
+    for i in range(n):
+        buf[i] ^= mask[i & 3]
+
+
+try:
+    from ._ws_native import mask_inplace as _mask_inplace
+except (ImportError, SyntaxError):
+    _mask_inplace = _mask_inplace_py
+
+
+def _mask(payload, mask):
+    buf = bytearray(payload)
+    _mask_inplace(buf, len(buf), mask)
+    return bytes(buf)
+
+
 URL_RE = re.compile(r"(wss|ws)://([A-Za-z0-9-\.]+)(?:\:([0-9]+))?(/.+)?")
 URI = namedtuple("URI", ("protocol", "hostname", "port", "path"))  # noqa: PYI024
 
@@ -132,7 +150,7 @@ class WebSocketClient:
         # Mask is 4 bytes
         mask_bits = struct.pack("!I", random.getrandbits(32))
         frame += mask_bits
-        payload = bytes(b ^ mask_bits[i % 4] for i, b in enumerate(payload))
+        payload = _mask(payload, mask_bits)
         return frame + payload
 
     async def handshake(self, uri, ssl, req):
@@ -205,7 +223,7 @@ class WebSocketClient:
             mask = await self.reader.read(4)
         payload = await self.reader.read(length)
         if has_mask:  # pragma: no cover
-            payload = bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
+            payload = _mask(payload, mask)
         return opcode, payload
 
 
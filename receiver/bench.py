@@ -0,0 +1,22 @@
+# Speed of the plain Python and viper variants of the websocket masking
+# loop. Run it on the board, e.g. with "mpremote run bench.py", or on a PC
+# with "python host/run.py receiver bench.py" (no viper variant there).
+
+from time import ticks_us, ticks_diff
+from aiohttp import aiohttp_ws
+
+def measure(f, args, n):
+    start = ticks_us()
+    for _ in range(n):
+        f(*args)
+    return ticks_diff(ticks_us(), start) / n
+
+mask = b'\x12\x34\x56\x78'
+for size in (16, 128, 1024):
+    buf = bytearray(size)
+    t_py = measure(aiohttp_ws._mask_inplace_py, (buf, size, mask), 200)
+    if aiohttp_ws._mask_inplace is aiohttp_ws._mask_inplace_py:
+        print(f"mask {size} bytes: python {t_py:.1f} us, viper not available")
+        continue
+    t_viper = measure(aiohttp_ws._mask_inplace, (buf, size, mask), 200)
+    print(f"mask {size} bytes: python {t_py:.1f} us, viper {t_viper:.1f} us, speedup {t_py / t_viper:.2f}x")
@@ -0,0 +1,211 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)
+
+Binary joystick state frame. The same file is used by the transmitter and
+the receiver, keep both copies identical."""
+
+import struct
+
+VERSION = 1
+CONTENT_TYPE = 'application/x-joystick-frame'
+HISTORY_CONTENT_TYPE = 'application/x-joystick-history'
+RC_CONTENT_TYPE = 'application/x-rc-frame'
+
+# version, number of channels, sequence number (low 16 bits), ticks_us()
+# timestamp, button bits, button presses counter (low 8 bits),
+# followed by channel values as signed 16 bit integers, and optionally by
+# the recent button edges: their number, then for each one its ticks_us()
+# timestamp and the new button state, oldest first. Frames without edges
+# end after the channels, readers only look at the edges if there are any
+HEADER_FORMAT = '<BBHIBB'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+EDGE_FORMAT = '<IB'
+EDGE_SIZE = struct.calcsize(EDGE_FORMAT)
+
+def size(channels, edges=0):
+    """Size of a frame, with room for the given number of button edges"""
+    if edges:
+        return HEADER_SIZE + 2 * channels + 1 + EDGE_SIZE * edges
+    return HEADER_SIZE + 2 * channels
+
+def pack_into(buf, seq, ticks, channels, buttons=0, presses=0, edges=None):
+    """Write a frame into a preallocated buffer of size(len(channels)),
+    or size(len(channels), max_edges) when edges, a sequence of (pressed,
+    ticks) tuples, is given. Unused edge slots are left as they are"""
+    n = len(channels)
+    struct.pack_into(HEADER_FORMAT, buf, 0, VERSION, n, seq & 0xFFFF,
+                     ticks & 0xFFFFFFFF, buttons, presses & 0xFF)
+    offset = HEADER_SIZE
+    for value in channels:
+        struct.pack_into('<h', buf, offset, value)
+        offset += 2
+    if edges is not None:
+        buf[offset] = len(edges)
+        offset += 1
+        for pressed, edge_ticks in edges:
+            struct.pack_into(EDGE_FORMAT, buf, offset, edge_ticks & 0xFFFFFFFF, pressed)
+            offset += EDGE_SIZE
+
+def pack(seq, ticks, channels, buttons=0, presses=0, edges=None):
+    buf = bytearray(size(len(channels), len(edges) if edges else 0))
+    pack_into(buf, seq, ticks, channels, buttons, presses, edges or None)
+    return bytes(buf)
+
+def is_newer(seq, last_seq):
+    """Whether a 16 bit sequence number comes after last_seq, taking the
+    wrap around into account"""
+    return 0 < ((seq - last_seq) & 0xFFFF) < 0x8000
+
+def unpack(data):
+    """Returns (seq, ticks, channels, buttons, presses, edges), edges as a
+    list of (pressed, ticks) tuples"""
+    version, n, seq, ticks, buttons, presses = struct.unpack_from(HEADER_FORMAT, data)
+    if version != VERSION:
+        raise ValueError("Unsupported frame version: " + str(version))
+    if len(data) < size(n):
+        raise ValueError("Frame too short")
+    channels = struct.unpack_from('<' + 'h' * n, data, HEADER_SIZE)
+    edges = []
+    offset = size(n)
+    if len(data) > offset:
+        count = data[offset]
+        if len(data) < size(n, count):
+            raise ValueError("Frame too short")
+        offset += 1
+        for _ in range(count):
+            edge_ticks, pressed = struct.unpack_from(EDGE_FORMAT, data, offset)
+            edges.append((pressed == 1, edge_ticks))
+            offset += EDGE_SIZE
+    return seq, ticks, channels, buttons, presses, edges
+
+# batch of samples: version, channels per record, number of records,
+# followed by the records: sequence number (low 16 bits), ticks_us()
+# timestamp, channel values as signed 8 bit integers, button bits
+HISTORY_HEADER_FORMAT = '<BBH'
+HISTORY_HEADER_SIZE = struct.calcsize(HISTORY_HEADER_FORMAT)
+RECORD_HEADER_FORMAT = '<HI'
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+
+def record_size(channels):
+    return RECORD_HEADER_SIZE + channels + 1
+
+def history_size(channels, count):
+    return HISTORY_HEADER_SIZE + count * record_size(channels)
+
+def pack_history_into(buf, channels, count):
+    """Write the batch header, the records follow with pack_record_into()"""
+    struct.pack_into(HISTORY_HEADER_FORMAT, buf, 0, VERSION, channels, count)
+
+def pack_record_into(buf, offset, seq, ticks, channels, buttons=0):
+    """Write a record at offset, returns the offset of the next one"""
+    struct.pack_into(RECORD_HEADER_FORMAT, buf, offset, seq & 0xFFFF, ticks & 0xFFFFFFFF)
+    offset += RECORD_HEADER_SIZE
+    for value in channels:
+        struct.pack_into('b', buf, offset, value)
+        offset += 1
+    buf[offset] = buttons
+    return offset + 1
+
+def unpack_history(data):
+    """Returns a list of (seq, ticks, channels, buttons) tuples"""
+    version, n, count = struct.unpack_from(HISTORY_HEADER_FORMAT, data)
+    if version != VERSION:
+        raise ValueError("Unsupported frame version: " + str(version))
+    if len(data) < history_size(n, count):
+        raise ValueError("Frame too short")
+    record_format = RECORD_HEADER_FORMAT + 'b' * n + 'B'
+    records = []
+    offset = HISTORY_HEADER_SIZE
+    for _ in range(count):
+        fields = struct.unpack_from(record_format, data, offset)
+        records.append((fields[0], fields[1], fields[2:2 + n], fields[-1]))
+        offset += record_size(n)
+    return records
+
+# SBUS style RC frame with a fixed size whatever the number of channels
+# used: start byte, 16 channels of 11 bits packed LSB first, flags and a
+# CRC-8 of the channels and flags in place of the SBUS end byte
+RC_START = 0x0F
+RC_CHANNELS = 16
+RC_SIZE = 25
+# channel values for -100%, 0 and +100%, the usual SBUS range
+RC_MIN = 173
+RC_CENTER = 992
+RC_MAX = 1811
+# flags: two digital channels, frame lost and failsafe as in SBUS
+RC_FLAG_CH17 = 0x01
+RC_FLAG_CH18 = 0x02
+RC_FLAG_FRAME_LOST = 0x04
+RC_FLAG_FAILSAFE = 0x08
+
+def rc_value(percent):
+    """Channel value for -100..100%"""
+    return RC_CENTER + percent * (RC_MAX - RC_CENTER) // 100
+
+def rc_percent(value):
+    """-100..100% for a channel value, rounded to the nearest"""
+    d = (value - RC_CENTER) * 100
+    half = (RC_MAX - RC_CENTER) // 2
+    if d >= 0:
+        return (d + half) // (RC_MAX - RC_CENTER)
+    return -((half - d) // (RC_MAX - RC_CENTER))
+
+def _crc8_table(poly):
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly if crc & 0x80 else crc << 1) & 0xFF
+        table[i] = crc
+    return table
+
+# CRC-8/DVB-S2, the one used by CRSF
+_CRC8_TABLE = _crc8_table(0xD5)
+
+def crc8(data, start=0, end=None):
+    table = _CRC8_TABLE
+    crc = 0
+    for i in range(start, len(data) if end is None else end):
+        crc = table[crc ^ data[i]]
+    return crc
+
+def pack_rc_into(buf, channels, flags=0):
+    """Write an RC frame into a preallocated buffer of RC_SIZE bytes.
+    channels holds up to RC_CHANNELS channel values, the rest are centered"""
+    buf[0] = RC_START
+    n = len(channels)
+    acc = 0
+    bits = 0
+    offset = 1
+    for i in range(RC_CHANNELS):
+        acc |= ((channels[i] if i < n else RC_CENTER) & 0x7FF) << bits
+        bits += 11
+        while bits >= 8:
+            buf[offset] = acc & 0xFF
+            acc >>= 8
+            bits -= 8
+            offset += 1
+    buf[23] = flags
+    buf[24] = crc8(buf, 1, 24)
+
+def unpack_rc_into(data, channels):
+    """Decode an RC frame into a preallocated array of RC_CHANNELS values,
+    returns the flags"""
+    if len(data) < RC_SIZE:
+        raise ValueError("Frame too short")
+    if data[0] != RC_START:
+        raise ValueError("Not an RC frame")
+    if crc8(data, 1, 24) != data[24]:
+        raise ValueError("Bad CRC")
+    acc = 0
+    bits = 0
+    offset = 1
+    for i in range(RC_CHANNELS):
+        while bits < 11:
+            acc |= data[offset] << bits
+            offset += 1
+            bits += 8
+        channels[i] = acc & 0x7FF
+        acc >>= 11
+        bits -= 11
+    return data[23]
@@ -1,10 +1,30 @@
 import aiohttp
 import asyncio
+from array import array
 import network
+import socket
+import frame
+from time import ticks_ms, ticks_diff
 
 SSID = "Pico transmitter"
 PASSWORD = "hellothisispico"
-SERVER_URL = 'http://192.168.4.1:5000/'
+SERVER_PORT = 5000
+UDP_PORT = 5001
+# how the joystick state is received:
+# 'http' - poll the / endpoint, 'udp' - frames pushed in UDP datagrams,
+# 'sse' - events streamed over one HTTP response,
+# 'ws' - binary frames pushed over a websocket,
+# 'longpoll' - requests answered only when the joystick state changes,
+# 'history' - batches of all samples taken since the last request
+TRANSPORT = 'http'
+LONG_POLL_TIMEOUT_MS = 10000
+# accept any UDP frame again after this long without a newer one, e.g.
+# when the transmitter rebooted and its sequence numbers started over
+UDP_RESYNC_MS = 500
+HISTORY_INTERVAL_MS = 100
+# format asked for by the http transport: 'bin' - binary frames,
+# 'rc' - SBUS style bit-packed RC frames, 'text' - human readable
+FORMAT = 'bin'
 
 def initNetwork():
     print("Initializing network")
@@ -23,19 +43,159 @@ async def connect():
         print('.',end='')
         await asyncio.sleep(1)
     print('\nnetwork config:', wlan.ifconfig())
+    # the transmitter is the gateway of its own network (192.168.4.1)
+    global SERVER_URL
+    SERVER_URL = 'http://{}:{}/'.format(wlan.ifconfig()[2], SERVER_PORT)
+
+def print_frame(data):
+    seq, ticks, channels, buttons, presses, edges = frame.unpack(data)
+    msg = f"#{seq} X={channels[0]}, Y={channels[1]}, B={buttons & 1}, presses={presses}"
+    if edges:
+        # the transmitter keeps sending the recent edges, as state@ticks_us
+        msg += ", E=" + " ".join(f"{int(pressed)}@{ticks}" for pressed, ticks in edges)
+    print(msg)
+
+rc_channels = array('H', [0] * frame.RC_CHANNELS)
+
+def print_rc_frame(data):
+    flags = frame.unpack_rc_into(data, rc_channels)
+    X = frame.rc_percent(rc_channels[0])
+    Y = frame.rc_percent(rc_channels[1])
+    # channel 18 toggles with every button press
+    print(f"X={X}, Y={Y}, B={flags & frame.RC_FLAG_CH17}, "
+          f"toggle={(flags & frame.RC_FLAG_CH18) >> 1}")
 
 async def get():
 
     async with aiohttp.ClientSession() as session:
+        if FORMAT == 'bin' or FORMAT == 'rc':
+            content_type = frame.CONTENT_TYPE if FORMAT == 'bin' else frame.RC_CONTENT_TYPE
+            async with session.get(SERVER_URL, headers={'Accept': content_type}) as response:
+                content = await response.read(int(response.headers.get('Content-Length', -1)))
+                if FORMAT == 'bin':
+                    print_frame(content)
+                else:
+                    print_rc_frame(content)
+                return content
         async with session.get(SERVER_URL) as response:
             #print("Status:", response.status)
             content = await response.text()
             print(content)
             return content
 
+async def stream_udp():
+    server = (wlan.ifconfig()[2], UDP_PORT)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    last_seq = None
+    accepted = ticks_ms()
+    registered = None
+    try:
+        while True:
+            # (re)register every second, the transmitter drops receivers
+            # it hasn't heard from for a while
+            if registered is None or ticks_diff(ticks_ms(), registered) > 1000:
+                sock.sendto(b'hello', server)
+                registered = ticks_ms()
+            # keep only the newest of the datagrams waiting
+            latest = None
+            while True:
+                try:
+                    # a joystick frame with its 8 recent button edges is 55 bytes
+                    data = sock.recv(64)
+                except OSError:
+                    break
+                # the transmitter's network is open, ignore anything that
+                # isn't a frame
+                if len(data) < frame.HEADER_SIZE:
+                    continue
+                try:
+                    seq, _, channels = frame.unpack(data)[:3]
+                except ValueError:
+                    continue
+                if len(channels) < 2:
+                    continue
+                if last_seq is not None and not frame.is_newer(seq, last_seq) and \
+                        ticks_diff(ticks_ms(), accepted) < UDP_RESYNC_MS:
+                    # stale or reordered datagram
+                    continue
+                last_seq = seq
+                accepted = ticks_ms()
+                latest = data
+            if latest is not None:
+                print_frame(latest)
+            await asyncio.sleep_ms(5)
+    finally:
+        sock.sendto(b'bye', server)
+        sock.close()
+
+async def stream_sse():
+    async with aiohttp.ClientSession() as session:
+        async with session.get(SERVER_URL + 'events?on=change') as response:
+            buffer = b''
+            while True:
+                chunk = await response.read(256)
+                if not chunk:
+                    print("Event stream closed")
+                    return
+                buffer += chunk
+                # events are separated by an empty line
+                while b'\n\n' in buffer:
+                    event, buffer = buffer.split(b'\n\n', 1)
+                    for line in event.split(b'\n'):
+                        if line.startswith(b'data: '):
+                            print(line[6:].decode())
+
+async def stream_ws():
+    url = 'ws://{}:{}/ws'.format(wlan.ifconfig()[2], SERVER_PORT)
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(url) as ws:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.BINARY:
+                    print_frame(msg.data)
+    print("Websocket closed")
+
+async def long_poll():
+    seq = -1
+    while True:
+        async with aiohttp.ClientSession() as session:
+            params = {'since': seq, 'timeout': LONG_POLL_TIMEOUT_MS}
+            async with session.get(SERVER_URL + 'poll', params=params) as response:
+                seq = int(response.headers.get('X-Seq', seq))
+                if response.status == 304:
+                    # nothing changed before the timeout
+                    continue
+                print(await response.text())
+
+async def poll_history():
+    seq = 0
+    while True:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(SERVER_URL + 'history', params={'after': seq}) as response:
+                seq = int(response.headers.get('X-Seq', seq))
+                records = frame.unpack_history(
+                    await response.read(int(response.headers.get('Content-Length', -1))))
+        if records:
+            # smooth over the batch
+            X = sum(channels[0] for _, _, channels, _ in records) / len(records)
+            Y = sum(channels[1] for _, _, channels, _ in records) / len(records)
+            B = records[-1][3] & 1
+            print(f"{len(records)} samples: X={X:.1f}, Y={Y:.1f}, B={B}")
+        await asyncio.sleep_ms(HISTORY_INTERVAL_MS)
+
 async def main():
     initNetwork()
     await connect()
+    if TRANSPORT == 'udp':
+        await stream_udp()
+    elif TRANSPORT == 'sse':
+        await stream_sse()
+    elif TRANSPORT == 'ws':
+        await stream_ws()
+    elif TRANSPORT == 'longpoll':
+        await long_poll()
+    elif TRANSPORT == 'history':
+        await poll_history()
     while True:
         await get()
         await asyncio.sleep_ms(250)
@@ -0,0 +1,47 @@
+# Speed of the plain Python and native code emitter variants of the hot
+# paths. Run it on the board, e.g. with "mpremote run bench.py", or on a PC
+# with "python host/run.py transmitter bench.py" (no native variants there).
+
+from time import ticks_us, ticks_diff
+import joystick
+from joystick import Joystick, FILTER_MEDIAN
+
+def measure(f, args, n):
+    start = ticks_us()
+    for _ in range(n):
+        f(*args)
+    return ticks_diff(ticks_us(), start) / n
+
+# the Joystick methods call each other through the class, so the python
+# side is timed with all of the plain methods put back, not only the one
+# being measured
+INSTALLED_KERNELS = {name: getattr(Joystick, name) for name in joystick.PY_KERNELS}
+
+def use_kernels(kernels):
+    for name, f in kernels.items():
+        setattr(Joystick, name, f)
+
+def report(name, python, native, args, n=1000, kernels=False):
+    if kernels:
+        use_kernels(joystick.PY_KERNELS)
+    try:
+        t_py = measure(python, args, n)
+    finally:
+        if kernels:
+            use_kernels(INSTALLED_KERNELS)
+    if native is python:
+        print(f"{name}: python {t_py:.1f} us, native not available")
+        return
+    t_native = measure(native, args, n)
+    print(f"{name}: python {t_py:.1f} us, native {t_native:.1f} us, speedup {t_py / t_native:.2f}x")
+
+joy = Joystick(27, 26, 22)
+report("Joystick.read", joystick.PY_KERNELS['read'], Joystick.read, (joy,),
+       kernels=True)
+joy.set_filter(4, FILTER_MEDIAN, 9)
+report("Joystick.read (4x oversampling, median of 9)",
+       joystick.PY_KERNELS['read'], Joystick.read, (joy,), kernels=True)
+# compare the whole read with both variants of the helpers it calls
+for name in ('_median', '_acquire'):
+    report("Joystick." + name, joystick.PY_KERNELS[name], getattr(Joystick, name),
+           (joy, joy._Xring) if name == '_median' else (joy,), kernels=True)
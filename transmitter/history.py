@@ -0,0 +1,59 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)"""
+
+from array import array
+import frame
+
+class History():
+    """The last `size` joystick samples, kept in typed arrays used as a
+    ring buffer, so they can be sent in batches."""
+
+    def __init__(self, size=64):
+        self.size = size
+        self._seqs = array('L', [0] * size)
+        self._ticks = array('L', [0] * size)
+        self._X = array('b', [0] * size)
+        self._Y = array('b', [0] * size)
+        self._buttons = bytearray(size)
+        # next position to write and number of samples stored
+        self._head = 0
+        self._count = 0
+
+    def append(self, state):
+        i = self._head
+        self._seqs[i] = state.seq
+        self._ticks[i] = state.ticks
+        self._X[i] = state.X
+        self._Y[i] = state.Y
+        self._buttons[i] = state.button
+        self._head = (i + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+    @property
+    def last_seq(self):
+        if not self._count:
+            return 0
+        return self._seqs[(self._head - 1) % self.size]
+
+    def pack(self, after):
+        """All stored samples with sequence number greater than after,
+        oldest first, packed with frame.pack_history_into()"""
+        size = self.size
+        # walk back from the newest to find where the requested samples start
+        count = 0
+        i = self._head
+        while count < self._count:
+            i = (i - 1) % size
+            if self._seqs[i] <= after:
+                break
+            count += 1
+        buf = bytearray(frame.history_size(2, count))
+        frame.pack_history_into(buf, 2, count)
+        i = (self._head - count) % size
+        offset = frame.HISTORY_HEADER_SIZE
+        for _ in range(count):
+            offset = frame.pack_record_into(buf, offset, self._seqs[i], self._ticks[i],
+                                            (self._X[i], self._Y[i]), self._buttons[i])
+            i = (i + 1) % size
+        return buf
@@ -0,0 +1,114 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)"""
+
+from machine import Pin, ADC
+from time import sleep_ms
+from array import array
+from joystick import build_lut
+
+class AnalogChannel():
+    """Potentiometer or joystick axis, remapped to range [-100, 100]
+    with the same calibration values as Joystick axes."""
+
+    def __init__(self, pinNumber: int, \
+                 restVal = 32768, \
+                 deadzone = 0, \
+                 minVal = 200, \
+                 maxVal = 65500, \
+                 reverse = False, \
+                 expo = 0, \
+                 curve = None):
+        self.pin = Pin(pinNumber)
+        self.adc = ADC(self.pin)
+        self.restVal = restVal
+        self.deadzone = deadzone
+        self.minVal = minVal
+        self.maxVal = maxVal
+        self.reverse = reverse
+        self.expo = expo
+        self.curve = curve
+
+    def build_lut(self, bits):
+        return build_lut(self.restVal, self.deadzone, self.minVal, self.maxVal,
+                         self.reverse, self.expo, self.curve, bits)
+
+class DigitalChannel():
+    """Switch or button, read as 1 when active and 0 otherwise.
+    With pull_up the switch is expected to short the pin to ground."""
+
+    def __init__(self, pinNumber: int, pull_up = True, invert = None):
+        self.pin = Pin(pinNumber, Pin.IN, Pin.PULL_UP if pull_up else None)
+        # active low when pulled up
+        self.invert = pull_up if invert is None else invert
+
+def joystick_channels(prefix, XaxisPinNumber, YaxisPinNumber, ButtonPinNumber,
+                      reverseX = False, reverseY = True):
+    """Channels of a joystick module, named prefix + X, Y and B"""
+    return [(prefix + 'X', AnalogChannel(XaxisPinNumber, 31500, 600, reverse=reverseX)),
+            (prefix + 'Y', AnalogChannel(YaxisPinNumber, 34000, 500, reverse=reverseY)),
+            (prefix + 'B', DigitalChannel(ButtonPinNumber))]
+
+class InputDevice():
+    """A set of analog and digital channels read together in one pass.
+
+    channels is a list of (name, channel) pairs, e.g.
+
+        InputDevice(joystick_channels('L', 27, 26, 22) +
+                    [('throttle', AnalogChannel(28)),
+                     ('lights', DigitalChannel(15))])
+
+    After read() the values of all channels, in declaration order, are in
+    the values array. Channel values are signed 16 bit integers."""
+
+    def __init__(self, channels, lut_bits = 10):
+        self.names = tuple(name for name, _ in channels)
+        self.channels = tuple(channel for _, channel in channels)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._lutBits = lut_bits
+        self._lutShift = 16 - lut_bits
+        self.values = array('h', [0] * len(self.channels))
+        self._compile()
+
+    def _compile(self):
+        # flatten channels into tuples of bound read methods, so read() does
+        # no attribute lookups or type checks per channel
+        analog = []
+        digital = []
+        for i, channel in enumerate(self.channels):
+            if isinstance(channel, AnalogChannel):
+                analog.append((i, channel.adc.read_u16, channel.build_lut(self._lutBits)))
+            else:
+                digital.append((i, channel.pin.value, int(channel.invert)))
+        # swap both in one assignment, read() never sees half of the update
+        self._plan = (tuple(analog), tuple(digital))
+
+    def set_calibration(self, name, **values):
+        """Change calibration of an analog channel, e.g.
+        set_calibration('throttle', deadzone=0, reverse=True)"""
+        channel = self.channels[self._index[name]]
+        for attr, value in values.items():
+            if not hasattr(channel, attr):
+                raise AttributeError("Unknown calibration value: " + attr)
+            setattr(channel, attr, value)
+        self._compile()
+
+    def read(self):
+        values = self.values
+        shift = self._lutShift
+        analog, digital = self._plan
+        for i, read_u16, lut in analog:
+            values[i] = lut[read_u16() >> shift]
+        for i, value, invert in digital:
+            values[i] = value() ^ invert
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __getitem__(self, name):
+        return self.values[self._index[name]]
+
+    def test(self):
+        while True:
+            self.read()
+            print(", ".join(f"{name} = {value}" for name, value in zip(self.names, self.values)))
+            sleep_ms(250)
@@ -1,17 +1,83 @@
 """ MIT License
 Copyright (c) 2025 Filip S. (polymentor@proton.me)"""
 
-from machine import Pin, ADC
-from time import sleep_ms
+from machine import Pin, ADC, disable_irq, enable_irq
+from time import sleep_ms, ticks_ms, ticks_us, ticks_diff
+from array import array
+import struct
+
+# filters applied to oversampled ADC readings
+FILTER_NONE = 0    # plain average of the samples taken in this read
+FILTER_MEDIAN = 1  # median of the last `window` samples
+FILTER_IIR = 2     # exponential moving average, alpha = 1 / 2**iir_shift
+
+# number of recent button edges kept and published with every sample,
+# older ones are dropped
+EDGE_QUEUE_SIZE = 8
+
+# smallest travel calibrate() accepts on each axis, in raw ADC units
+CALIBRATION_MIN_TRAVEL = 4096
+
+# calibration profile stored in flash, 23 bytes:
+# magic, format version, rest, deadzone, min, max for X and Y, CRC-16
+PROFILE_FILE = 'joystick.cal'
+_PROFILE_MAGIC = b'JCAL'
+_PROFILE_VERSION = 1
+_PROFILE_FORMAT = '<4sB8H'
+_PROFILE_SIZE = struct.calcsize(_PROFILE_FORMAT)
+# order of calibration values in the profile
+_PROFILE_FIELDS = ('XrestVal', 'Xdeadzone', 'Xmin', 'Xmax',
+                   'YrestVal', 'Ydeadzone', 'Ymin', 'Ymax')
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE"""
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+def build_lut(restVal, deadzone, minVal, maxVal, reverse=False, expo=0, curve=None, bits=10):
+    """Compile axis calibration into a lookup table mapping a raw ADC value
+    shifted right by (16 - bits) to a position in range [-100, 100].
+
+    expo blends in a cubic response (0 - linear, 1 - fully cubic), curve is
+    an optional function applied last, taking and returning a position."""
+    shift = 16 - bits
+    lut = array('b', bytes(1 << bits))
+    for i in range(1 << bits):
+        # value in the middle of the bucket
+        raw = (i << shift) + ((1 << shift) >> 1)
+        if raw < restVal + deadzone and raw > restVal - deadzone:
+            continue
+        # remap to range [-100, 100]
+        pos = max(raw - minVal, 0) * 200 // (maxVal - minVal) - 100
+        if expo:
+            pos = round(pos * (1 - expo) + pos * pos * pos * expo / 10000)
+        if curve is not None:
+            pos = curve(pos)
+        pos = min(max(pos, -100), 100)
+        lut[i] = -pos if reverse else pos
+    return lut
+
 
 class Joystick():
-    
+
     def __init__(self, XaxisPinNumber: int, \
                  YaxisPinNumber: int, \
                  ButtonPinNumber: int, \
                  reverseX = False, \
-                 reverseY = True):
-        
+                 reverseY = True, \
+                 oversample = 1, \
+                 filter = FILTER_NONE, \
+                 window = 5, \
+                 iir_shift = 2, \
+                 lut_bits = 10, \
+                 debounce_ms = 20):
+
         self._Xpin = Pin(XaxisPinNumber)
         self._Xpot = ADC(self._Xpin)
 
@@ -22,6 +88,21 @@ class Joystick():
         # position values
         self.X = 0
         self.Y = 0
+        # debounced button state and number of presses since start
+        self.button = False
+        self.presses = 0
+        # ring of the most recent button edges: ticks_us() timestamps and
+        # new states, and the total number of edges so far
+        self._debounce_us = debounce_ms * 1000
+        self._edgeTicks = array('I', [0] * EDGE_QUEUE_SIZE)
+        self._edgeStates = bytearray(EDGE_QUEUE_SIZE)
+        self._edgeHead = 0
+        self._edgeCount = 0
+        self._edgeTotal = 0
+        self._lastEdge = ticks_us()
+        # recent_edges() result, rebuilt only after a new edge
+        self._edges = ()
+        self._edgesTotal = 0
         # reversing settings
         self.reverseX = reverseX
         self.reverseY = reverseY
@@ -34,27 +115,315 @@ class Joystick():
         self._Ymin = 200
         self._Xmax = 65500
         self._Ymax = 65500
+        # response curves
+        self.expoX = 0
+        self.expoY = 0
+        self.curveX = None
+        self.curveY = None
+        # calibration compiled into lookup tables
+        self._lutBits = lut_bits
+        self._lutShift = 16 - lut_bits
+        self._build_luts()
+        # acquisition settings
+        self.set_filter(oversample, filter, window, iir_shift)
+        self.ButtonPin.irq(self._button_irq, Pin.IRQ_FALLING | Pin.IRQ_RISING)
+
+    def _button_edge(self, pressed, now):
+        # called with interrupts disabled or from the IRQ handler
+        self.button = pressed
+        if pressed:
+            self.presses += 1
+        self._lastEdge = now
+        size = EDGE_QUEUE_SIZE
+        if self._edgeCount == size:
+            # ring full, drop the oldest edge
+            self._edgeHead = (self._edgeHead + 1) % size
+            self._edgeCount -= 1
+        i = (self._edgeHead + self._edgeCount) % size
+        self._edgeTicks[i] = now
+        self._edgeStates[i] = pressed
+        self._edgeCount += 1
+        self._edgeTotal += 1
+
+    def _button_irq(self, pin):
+        now = ticks_us()
+        pressed = not pin.value()
+        # ignore bounces - edges back to the current state or too soon after
+        # the last accepted one
+        if pressed == self.button or ticks_diff(now, self._lastEdge) < self._debounce_us:
+            return
+        self._button_edge(pressed, now)
+
+    def _sync_button(self):
+        # catch up on an edge ignored by debouncing (e.g. a release shorter
+        # than the debounce time) once the pin has settled
+        pressed = not self.ButtonPin.value()
+        if pressed != self.button:
+            now = ticks_us()
+            if ticks_diff(now, self._lastEdge) >= self._debounce_us:
+                state = disable_irq()
+                if pressed != self.button:
+                    self._button_edge(pressed, now)
+                enable_irq(state)
+
+    def recent_edges(self):
+        """Returns the last EDGE_QUEUE_SIZE button edges, as a tuple of
+        (pressed, ticks_us) tuples, oldest first. The edges aren't consumed,
+        every sample carries the same ones until the next edge, so clients
+        that miss samples still see them and tell them apart by timestamp.
+        The tuple is only rebuilt after a new edge."""
+        if self._edgesTotal == self._edgeTotal:
+            return self._edges
+        state = disable_irq()
+        edges = []
+        i = self._edgeHead
+        for _ in range(self._edgeCount):
+            edges.append((self._edgeStates[i] == 1, self._edgeTicks[i]))
+            i = (i + 1) % EDGE_QUEUE_SIZE
+        self._edgesTotal = self._edgeTotal
+        enable_irq(state)
+        self._edges = tuple(edges)
+        return self._edges
+
+    def _build_luts(self):
+        bits = self._lutBits
+        Xlut = build_lut(self._XrestVal, self._Xdeadzone, self._Xmin, self._Xmax,
+                         self.reverseX, self.expoX, self.curveX, bits)
+        Ylut = build_lut(self._YrestVal, self._Ydeadzone, self._Ymin, self._Ymax,
+                         self.reverseY, self.expoY, self.curveY, bits)
+        # replace both tables in one assignment, so read() never sees
+        # a mix of old and new calibration
+        self._luts = (Xlut, Ylut)
 
-    def read(self):
-        rawXvalue = self._Xpot.read_u16()
-        rawYvalue = self._Ypot.read_u16()
-        #if raw value is within deadzone, set to 0
-        if rawXvalue < self._XrestVal + self._Xdeadzone and rawXvalue > self._XrestVal - self._Xdeadzone:
-            self.X = 0
-        else:
-            # remap to range [-100, 100]
-            self.X = max(rawXvalue - self._Xmin, 0) * 200 // (self._Xmax - self._Xmin) - 100
-            if self.reverseX:
-                self.X = -self.X
-        if rawYvalue < self._YrestVal + self._Ydeadzone and rawYvalue > self._YrestVal - self._Ydeadzone:
-            self.Y = 0
-        else:
-            self.Y = max(rawYvalue - self._Ymin, 0) * 200 // (self._Ymax - self._Ymin) - 100
-            if self.reverseY:
-                self.Y = -self.Y
+    def set_calibration(self, **values):
+        """Change calibration and rebuild the lookup tables, e.g.
+        set_calibration(XrestVal=32000, Xdeadzone=400, expoY=0.3).
+        Accepts XrestVal, YrestVal, Xdeadzone, Ydeadzone, Xmin, Ymin, Xmax,
+        Ymax, reverseX, reverseY, expoX, expoY, curveX, curveY."""
+        for name, value in values.items():
+            if name.startswith('reverse') or name.startswith('expo') or name.startswith('curve'):
+                attr = name
+            else:
+                attr = '_' + name
+            if not hasattr(self, attr):
+                raise AttributeError("Unknown calibration value: " + name)
+            setattr(self, attr, value)
+        self._build_luts()
+        if 'XrestVal' in values or 'YrestVal' in values:
+            self._seed_filter()
+
+    def calibrate(self, rest_ms=2000, travel_ms=6000, margin=2, interval_ms=2):
+        """Measure calibration values and apply them.
+
+        First the stick has to be left centered for rest_ms - the average
+        becomes the rest value and the noise band (times margin) the
+        deadzone. Then it has to be moved all around its full range for
+        travel_ms to find the extremes."""
+        print("Calibration: leave the joystick centered")
+        sleep_ms(500)
+        count = 0
+        Xsum = Ysum = 0
+        Xlow = Ylow = 65535
+        Xhigh = Yhigh = 0
+        start = ticks_ms()
+        while ticks_diff(ticks_ms(), start) < rest_ms:
+            x = self._Xpot.read_u16()
+            y = self._Ypot.read_u16()
+            Xsum += x
+            Ysum += y
+            Xlow = min(Xlow, x)
+            Xhigh = max(Xhigh, x)
+            Ylow = min(Ylow, y)
+            Yhigh = max(Yhigh, y)
+            count += 1
+            sleep_ms(interval_ms)
+        Xrest = Xsum // count
+        Yrest = Ysum // count
+        Xdeadzone = max(Xhigh - Xrest, Xrest - Xlow) * margin
+        Ydeadzone = max(Yhigh - Yrest, Yrest - Ylow) * margin
+
+        print("Calibration: move the joystick around its full range")
+        Xmin = Ymin = 65535
+        Xmax = Ymax = 0
+        start = ticks_ms()
+        while ticks_diff(ticks_ms(), start) < travel_ms:
+            x = self._Xpot.read_u16()
+            y = self._Ypot.read_u16()
+            Xmin = min(Xmin, x)
+            Xmax = max(Xmax, x)
+            Ymin = min(Ymin, y)
+            Ymax = max(Ymax, y)
+            sleep_ms(interval_ms)
+        if Xmax - Xmin <= max(2 * Xdeadzone, CALIBRATION_MIN_TRAVEL) or \
+                Ymax - Ymin <= max(2 * Ydeadzone, CALIBRATION_MIN_TRAVEL):
+            raise ValueError("Joystick wasn't moved during calibration")
+
+        self.set_calibration(XrestVal=Xrest, Xdeadzone=Xdeadzone, Xmin=Xmin, Xmax=Xmax,
+                             YrestVal=Yrest, Ydeadzone=Ydeadzone, Ymin=Ymin, Ymax=Ymax)
+        print("Calibration done:", self.calibration())
+
+    def calibration(self):
+        """Current calibration values as a dictionary"""
+        return {name: getattr(self, '_' + name) for name in _PROFILE_FIELDS}
+
+    def save_profile(self, path=PROFILE_FILE):
+        values = [min(max(int(getattr(self, '_' + name)), 0), 65535)
+                  for name in _PROFILE_FIELDS]
+        data = struct.pack(_PROFILE_FORMAT, _PROFILE_MAGIC, _PROFILE_VERSION, *values)
+        with open(path, 'wb') as f:
+            f.write(data)
+            f.write(struct.pack('<H', crc16(data)))
+
+    def load_profile(self, path=PROFILE_FILE):
+        """Load calibration saved by save_profile(). Returns False if there
+        is no valid profile, leaving the current calibration untouched."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return False
+        if len(data) != _PROFILE_SIZE + 2:
+            return False
+        if struct.unpack_from('<H', data, _PROFILE_SIZE)[0] != crc16(data[:_PROFILE_SIZE]):
+            return False
+        fields = struct.unpack_from(_PROFILE_FORMAT, data)
+        if fields[0] != _PROFILE_MAGIC or fields[1] != _PROFILE_VERSION:
+            return False
+        values = dict(zip(_PROFILE_FIELDS, fields[2:]))
+        if values['Xmax'] <= values['Xmin'] or values['Ymax'] <= values['Ymin']:
+            return False
+        self.set_calibration(**values)
+        return True
+
+    def set_filter(self, oversample=1, filter=FILTER_NONE, window=5, iir_shift=2):
+        """Configure ADC acquisition. Every read takes `oversample` samples
+        per axis (cost is 2 * oversample ADC conversions per read), which are
+        then reduced with the selected filter. All buffers are allocated
+        here, so read() itself doesn't allocate."""
+        if oversample < 1:
+            raise ValueError("oversample must be at least 1")
+        if window < oversample:
+            window = oversample
+        self._oversample = oversample
+        self._filter = filter
+        self._window = window
+        self._iir_shift = iir_shift
+        # ring buffers with the most recent raw samples, one per axis
+        self._Xring = array('H', bytes(2 * window))
+        self._Yring = array('H', bytes(2 * window))
+        self._ringPos = 0
+        # scratch buffer for median calculation
+        self._sorted = array('H', [0] * window)
+        self._seed_filter()
+
+    def _seed_filter(self):
+        # start the filters from the rest position, set_calibration() calls
+        # this again when the rest values change
+        Xrest = self._XrestVal
+        Yrest = self._YrestVal
+        for i in range(self._window):
+            self._Xring[i] = Xrest
+            self._Yring[i] = Yrest
+        # IIR filter state, kept scaled by 2**iir_shift to not lose precision
+        self._Xiir = Xrest << self._iir_shift
+        self._Yiir = Yrest << self._iir_shift
+        # filtered raw values, stored here instead of returned as a tuple
+        self._rawX = Xrest
+        self._rawY = Yrest
+
+    def _median(self, ring):
+        # insertion sort into the preallocated scratch buffer
+        buf = self._sorted
+        n = self._window
+        for i in range(n):
+            v = ring[i]
+            j = i - 1
+            while j >= 0 and buf[j] > v:
+                buf[j + 1] = buf[j]
+                j -= 1
+            buf[j + 1] = v
+        return buf[n >> 1]
+
+    def _acquire(self):
+        xpot = self._Xpot
+        ypot = self._Ypot
+        n = self._oversample
+        if n == 1 and self._filter == FILTER_NONE:
+            self._rawX = xpot.read_u16()
+            self._rawY = ypot.read_u16()
+            return
+        xring = self._Xring
+        yring = self._Yring
+        window = self._window
+        pos = self._ringPos
+        for _ in range(n):
+            xring[pos] = xpot.read_u16()
+            yring[pos] = ypot.read_u16()
+            pos += 1
+            if pos == window:
+                pos = 0
+        self._ringPos = pos
+        if self._filter == FILTER_MEDIAN:
+            self._rawX = self._median(xring)
+            self._rawY = self._median(yring)
+            return
+        if self._filter == FILTER_IIR:
+            shift = self._iir_shift
+            xacc = self._Xiir
+            yacc = self._Yiir
+            # oldest sample of this read first, so the newest weighs the most
+            pos = (pos - n) % window
+            for _ in range(n):
+                xacc += xring[pos] - (xacc >> shift)
+                yacc += yring[pos] - (yacc >> shift)
+                pos += 1
+                if pos == window:
+                    pos = 0
+            self._Xiir = xacc
+            self._Yiir = yacc
+            self._rawX = xacc >> shift
+            self._rawY = yacc >> shift
+            return
+        # average of the samples taken in this read
+        xsum = 0
+        ysum = 0
+        for _ in range(n):
+            pos -= 1
+            if pos < 0:
+                pos = window - 1
+            xsum += xring[pos]
+            ysum += yring[pos]
+        self._rawX = xsum // n
+        self._rawY = ysum // n
+
+    def read(self, sync_button=True):
+        """Read the axes. sync_button=False leaves the button edge queue
+        alone, for reading from another core than the one taking the pin
+        IRQ, which then has to call _sync_button() itself."""
+        self._acquire()
+        Xlut, Ylut = self._luts
+        shift = self._lutShift
+        self.X = Xlut[self._rawX >> shift]
+        self.Y = Ylut[self._rawY >> shift]
+        if sync_button:
+            self._sync_button()
 
     def test(self):
         while True:
             self.read()
-            print(f"X = {self.X}, Y = {self.Y}")
+            print(f"X = {self.X}, Y = {self.Y}, button = {self.button}")
             sleep_ms(250)
+
+# plain Python versions of the hot paths, kept for benchmarking
+PY_KERNELS = {'_median': Joystick._median, '_acquire': Joystick._acquire, 'read': Joystick.read}
+
+# use the native code emitter variants where the firmware supports them,
+# on CPython importing micropython fails and the plain versions stay
+try:
+    import joystick_native
+    Joystick._median = joystick_native._median
+    Joystick._acquire = joystick_native._acquire
+    Joystick.read = joystick_native.read
+    NATIVE_KERNELS = True
+except (ImportError, SyntaxError):
+    NATIVE_KERNELS = False
@@ -0,0 +1,87 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)
+
+Native code emitter variants of Joystick's hot paths, installed by
+joystick.py when the firmware supports them. The code is kept the same
+as the plain Python methods, only the median sort is rewritten for viper.
+"""
+
+import micropython
+from joystick import FILTER_NONE, FILTER_MEDIAN, FILTER_IIR
+
+@micropython.viper
+def _median_viper(ring: ptr16, buf: ptr16, n: int) -> int:
+    for i in range(n):
+        v = ring[i]
+        j = i - 1
+        while j >= 0 and buf[j] > v:
+            buf[j + 1] = buf[j]
+            j -= 1
+        buf[j + 1] = v
+    return buf[n >> 1]
+
+def _median(self, ring):
+    return _median_viper(ring, self._sorted, self._window)
+
+@micropython.native
+def _acquire(self):
+    xpot = self._Xpot
+    ypot = self._Ypot
+    n = self._oversample
+    if n == 1 and self._filter == FILTER_NONE:
+        self._rawX = xpot.read_u16()
+        self._rawY = ypot.read_u16()
+        return
+    xring = self._Xring
+    yring = self._Yring
+    window = self._window
+    pos = self._ringPos
+    for _ in range(n):
+        xring[pos] = xpot.read_u16()
+        yring[pos] = ypot.read_u16()
+        pos += 1
+        if pos == window:
+            pos = 0
+    self._ringPos = pos
+    if self._filter == FILTER_MEDIAN:
+        self._rawX = self._median(xring)
+        self._rawY = self._median(yring)
+        return
+    if self._filter == FILTER_IIR:
+        shift = self._iir_shift
+        xacc = self._Xiir
+        yacc = self._Yiir
+        # oldest sample of this read first, so the newest weighs the most
+        pos = (pos - n) % window
+        for _ in range(n):
+            xacc += xring[pos] - (xacc >> shift)
+            yacc += yring[pos] - (yacc >> shift)
+            pos += 1
+            if pos == window:
+                pos = 0
+        self._Xiir = xacc
+        self._Yiir = yacc
+        self._rawX = xacc >> shift
+        self._rawY = yacc >> shift
+        return
+    # average of the samples taken in this read
+    xsum = 0
+    ysum = 0
+    for _ in range(n):
+        pos -= 1
+        if pos < 0:
+            pos = window - 1
+        xsum += xring[pos]
+        ysum += yring[pos]
+    self._rawX = xsum // n
+    self._rawY = ysum // n
+
+@micropython.native
+def read(self, sync_button=True):
+    self._acquire()
+    Xlut, Ylut = self._luts
+    shift = self._lutShift
+    self.X = Xlut[self._rawX >> shift]
+    self.Y = Ylut[self._rawY >> shift]
+    if sync_button:
+        self._sync_button()
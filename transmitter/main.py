@@ -1,12 +1,41 @@
 import asyncio
+from array import array
 import network
-from joystick import Joystick
-from microdot import Microdot
+import frame
+from joystick import Joystick, EDGE_QUEUE_SIZE
+from microdot import Microdot, Response, FixedResponse
+from microdot.websocket import WebSocket, WebSocketError, with_websocket
+from history import History
+from pubsub import Publisher
+from sampler import Sampler, ThreadedSampler
+from udpstream import UdpStreamer
 
 SSID = "Pico transmitter"
 PASSWORD = "hellothisispico"
+# 0 reads the joystick only when a client needs a fresh sample: requests
+# to / and UDP receivers read it when the last sample is too old, /events,
+# /ws and /poll every FRESHNESS_MS while they wait. /history only holds
+# the samples read for those clients
+SAMPLE_RATE_HZ = 200
+# read the joystick on the second core instead of in the asyncio loop
+SAMPLE_ON_CORE1 = False
+# requests to / within this many ms of the last reading share it
+FRESHNESS_MS = 5
+# push frames over UDP to receivers which register on this port
+UDP_PORT = 5001
+UDP_RATE_HZ = 100
+# longest time a /poll request waits for a change
+LONG_POLL_TIMEOUT_MS = 10000
+# number of recent samples available from /history
+HISTORY_SIZE = 64
 
 joy = Joystick(27, 26, 22)
+if SAMPLE_ON_CORE1 and SAMPLE_RATE_HZ:
+    sampler = ThreadedSampler(joy, SAMPLE_RATE_HZ)
+else:
+    sampler = Sampler(joy, SAMPLE_RATE_HZ, FRESHNESS_MS)
+history = History(HISTORY_SIZE)
+sampler.listeners.append(history.append)
 app = Microdot()
 
 def initNetwork():
@@ -19,6 +48,14 @@ def initNetwork():
     print("Network initialized")
     print(wlan.ifconfig())
 
+def initJoystick():
+    # hold the joystick button while powering up to recalibrate
+    if joy.ButtonPin.value() == 0:
+        joy.calibrate()
+        joy.save_profile()
+    elif not joy.load_profile():
+        print("No valid calibration profile, using defaults")
+
 def get_connected_clients():
     """
     Gets a list of connected clients in AP mode.
@@ -55,14 +92,145 @@ async def connection_detector():
         #print(clients)
         await asyncio.sleep(1)
 
+def response_format(request):
+    # binary or RC frames are sent when asked for with ?fmt=bin or ?fmt=rc,
+    # or with the Accept header, text otherwise
+    fmt = request.args.get('fmt')
+    if fmt:
+        return fmt
+    accept = request.headers.get('Accept', '')
+    if frame.CONTENT_TYPE in accept:
+        return 'bin'
+    if frame.RC_CONTENT_TYPE in accept:
+        return 'rc'
+    return 'text'
+
+def encode_frame(state):
+    return frame.pack(state.seq, state.ticks, (state.X, state.Y),
+                      int(state.button), state.presses, state.edges)
+
+def encode_text(state):
+    # the recent button edges as state@ticks_us, oldest first
+    msg = f"X={state.X}, Y={state.Y}, B={int(state.button)}"
+    if state.edges:
+        msg += ", E=" + " ".join(f"{int(pressed)}@{ticks}" for pressed, ticks in state.edges)
+    return msg
+
+def encode_event(state):
+    return f"id: {state.seq}\ndata: {encode_text(state)}\n\n".encode()
+
+# every sample is encoded once per format, whatever the number of clients
+publisher = Publisher(sampler, {
+    'frame': encode_frame,
+    'text': encode_text,
+    'event': encode_event,
+    'ws': lambda state: WebSocket.encode(encode_frame(state)),
+})
+
+udp = UdpStreamer(publisher, 'frame', UDP_PORT, UDP_RATE_HZ)
+
+# binary frames on / and /poll are patched into this preallocated response
+# instead of building a new one for every request, with room for all of the
+# recent button edges
+frame_response = FixedResponse(frame.size(2, EDGE_QUEUE_SIZE),
+                               {'Content-Type': frame.CONTENT_TYPE}, {'X-Seq': 10})
+rc_response = FixedResponse(frame.RC_SIZE, {'Content-Type': frame.RC_CONTENT_TYPE},
+                            {'X-Seq': 10})
+# X and Y on channels 1 and 2, the rest centered, the button as channel 17.
+# RC frames have no room for edge timestamps, channel 18 toggles with every
+# press instead, so presses between two frames aren't lost
+rc_channels = array('H', [frame.RC_CENTER] * frame.RC_CHANNELS)
+
+def respond(request, state):
+    fmt = response_format(request)
+    if fmt == 'bin':
+        frame_response.set_int('X-Seq', state.seq)
+        frame.pack_into(frame_response.body_view, state.seq, state.ticks,
+                        (state.X, state.Y), int(state.button), state.presses,
+                        state.edges)
+        return frame_response
+    if fmt == 'rc':
+        rc_response.set_int('X-Seq', state.seq)
+        rc_channels[0] = frame.rc_value(state.X)
+        rc_channels[1] = frame.rc_value(state.Y)
+        flags = frame.RC_FLAG_CH17 if state.button else 0
+        if state.presses & 1:
+            flags |= frame.RC_FLAG_CH18
+        frame.pack_rc_into(rc_response.body_view, rc_channels, flags)
+        return rc_response
+    headers = {'X-Seq': str(state.seq)}
+    latest = state is sampler.latest
+    msg = publisher.get('text') if latest else encode_text(state)
+    return Response(msg, headers=headers)
+
 @app.route('/')
 async def index(request):
-    joy.read()
-    msg = f"X={joy.X}, Y={joy.Y}"
-    return msg
+    return respond(request, sampler.fresh(FRESHNESS_MS))
+
+@app.route('/poll')
+async def poll(request):
+    # long-poll: ?since=<X-Seq of the last response> returns as soon as the
+    # state differs from that sample, or with 304 after ?timeout=<ms>
+    since = request.args.get('since', -1, type=int)
+    timeout = min(request.args.get('timeout', LONG_POLL_TIMEOUT_MS, type=int), LONG_POLL_TIMEOUT_MS)
+    state = await sampler.wait_change(since, timeout)
+    if sampler.changed_seq <= since:
+        return Response(status_code=304, headers={'X-Seq': str(state.seq)})
+    return respond(request, state)
+
+@app.route('/history')
+async def get_history(request):
+    # every stored sample newer than ?after=<X-Seq of the last response>,
+    # in one packed batch
+    after = request.args.get('after', 0, type=int)
+    return Response(history.pack(after), headers={'Content-Type': frame.HISTORY_CONTENT_TYPE,
+                                                  'X-Seq': str(history.last_seq)})
+
+@app.route('/events')
+async def events(request):
+    # server-sent events, one per sample, or with ?on=change only when the
+    # position or button state changes. The body has to be an async
+    # iterator object, MicroPython doesn't support yield inside async def
+    on_change = request.args.get('on') == 'change'
+    return Response(publisher.subscribe('event', on_change),
+                    headers={'Content-Type': 'text/event-stream',
+                             'Cache-Control': 'no-cache'})
+
+@app.route('/ws')
+@with_websocket
+async def ws_joystick(request, ws):
+    # binary frames pushed over a websocket, one per sample, or with
+    # ?on=change only when the position or button state changes
+    on_change = request.args.get('on') == 'change'
+    subscription = publisher.subscribe('ws', on_change)
+
+    async def receive():
+        # pings are answered inside receive(), it raises when the client
+        # closes the connection, which ends the subscription right away
+        try:
+            while True:
+                await ws.receive()
+        except (WebSocketError, OSError):
+            pass
+        finally:
+            await subscription.aclose()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        async for data in subscription:
+            await ws.send_frame(data)
+    finally:
+        receiver.cancel()
+        try:
+            await receiver
+        except asyncio.CancelledError:
+            pass
 
 async def main():
+    initJoystick()
     initNetwork()
+    sampler.start()
+    udp.start()
     asyncio.create_task(connection_detector())
     asyncio.create_task(app.start_server(debug=True))
     while True:
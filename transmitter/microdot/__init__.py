@@ -1,2 +1,2 @@
-from microdot.microdot import Microdot, Request, Response, abort, redirect, \
-    send_file  # noqa: F401
+from microdot.microdot import Microdot, Request, Response, FixedResponse, \
+    abort, redirect, send_file  # noqa: F401
@@ -50,6 +50,26 @@ except ImportError:  # pragma: no cover
     def print_exception(exc):
         traceback.print_exc()
 
+
+def parse_header_line(headers, line):
+    """Add a raw header line to the headers dictionary. Returns ``False``
+    for the empty line that ends the headers."""
+    line = line.strip().decode()
+    if line == '':
+        return False
+    header, value = line.split(':', 1)
+    headers[header] = value.strip()
+    return True
+
+
+try:
+    import micropython  # noqa: F401
+    COPY_SHARED_BUFFERS = False
+except ImportError:  # pragma: no cover
+    # the CPython transport can keep a view of the written data queued
+    # after awrite() returns, so reused buffers are copied before writing
+    COPY_SHARED_BUFFERS = True
+
 MUTED_SOCKET_ERRORS = [
     32,  # Broken pipe
     54,  # Connection reset by peer
@@ -148,6 +168,283 @@ class NoCaseDict(dict):
             self[key] = value
 
 
+class Headers:
+    """A compact case-insensitive header store.
+
+    :param initial_dict: an initial dictionary of headers to initialize this
+                         object with.
+
+    Names and values are kept in a single flat list, and lookups scan it.
+    For the few headers of a response this takes less memory than a
+    dictionary, and about the same time.
+
+    Example::
+
+        >>> h = Headers({'Content-Type': 'text/html'})
+        >>> print(h['content-type'])
+        text/html
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, initial_dict=None):
+        self._items = []
+        if initial_dict:
+            for key, value in initial_dict.items():
+                self[key] = value
+
+    def _find(self, key):
+        items = self._items
+        kl = None
+        for i in range(0, len(items), 2):
+            name = items[i]
+            if name == key:
+                return i
+            if len(name) == len(key):
+                if kl is None:
+                    kl = key.lower()
+                if name.lower() == kl:
+                    return i
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._items[i + 1]
+
+    def __setitem__(self, key, value):
+        i = self._find(key)
+        if i < 0:
+            self._items.append(key)
+            self._items.append(value)
+        else:
+            self._items[i + 1] = value
+
+    def __delitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        del self._items[i:i + 2]
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return iter(self._items[::2])
+
+    def __len__(self):
+        return len(self._items) // 2
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return default if i < 0 else self._items[i + 1]
+
+    def pop(self, key, default=None):
+        i = self._find(key)
+        if i < 0:
+            return default
+        value = self._items[i + 1]
+        del self._items[i:i + 2]
+        return value
+
+    def setdefault(self, key, default=None):
+        i = self._find(key)
+        if i < 0:
+            self[key] = default
+            return default
+        return self._items[i + 1]
+
+    def update(self, other_dict):
+        for key, value in other_dict.items():
+            self[key] = value
+
+    def keys(self):
+        return self._items[::2]
+
+    def values(self):
+        return self._items[1::2]
+
+    def items(self):
+        items = self._items
+        return [(items[i], items[i + 1]) for i in range(0, len(items), 2)]
+
+    def __repr__(self):  # pragma: no cover
+        return repr(dict(self.items()))
+
+
+class RequestHeaders:
+    """A case-insensitive view of a raw request header block.
+
+    :param raw: The header lines as bytes, each one ending with ``\\r\\n``
+                or a bare ``\\n``.
+
+    Single headers are looked up in the raw bytes when they are first asked
+    for, the whole block is only parsed into a :class:`Headers` when the
+    headers are iterated or modified.
+    """
+    __slots__ = ('raw', '_lower', '_dict')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._lower = None
+        self._dict = None
+
+    def _parse(self):
+        if self._dict is None:
+            headers = Headers()
+            for line in self.raw.split(b'\n'):
+                # parse_header_line() strips the \r of CRLF line endings
+                if line.strip():
+                    parse_header_line(headers, line)
+            self._dict = headers
+        return self._dict
+
+    def get(self, key, default=None):
+        if self._dict is not None:
+            return self._dict.get(key, default)
+        if self._lower is None:
+            self._lower = b'\n' + self.raw.lower()
+        name = b'\n' + key.lower().encode() + b':'
+        i = self._lower.find(name)
+        if i < 0:
+            return default
+        if self._lower.find(name, i + 1) >= 0:
+            # repeated header, leave it to the full parser
+            return self._parse().get(key, default)
+        # _lower has one extra byte at the start
+        start = i + len(name) - 1
+        end = self.raw.find(b'\n', start)
+        return self.raw[start:end].strip().decode()
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        self._parse()[key] = value
+
+    def __delitem__(self, key):
+        del self._parse()[key]
+
+    def __iter__(self):
+        return iter(self._parse())
+
+    def __len__(self):
+        return len(self._parse())
+
+    def keys(self):
+        return self._parse().keys()
+
+    def values(self):
+        return self._parse().values()
+
+    def items(self):
+        return self._parse().items()
+
+    def __repr__(self):  # pragma: no cover
+        return repr(self._parse())
+
+
+class BufferedStream:
+    """Buffering wrapper for the input stream of a connection.
+
+    :param stream: The stream to wrap.
+    :param buffer_size: The number of bytes to read at a time.
+
+    The request line and headers are read in bulk with :meth:`read_head`.
+    Bytes read past them are kept for the body and for the following
+    requests on the same connection.
+    """
+    __slots__ = ('stream', 'buffer_size', 'buffer')
+
+    def __init__(self, stream, buffer_size=512):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.buffer = b''
+
+    async def read_until(self, separator, max_length=None):
+        """Return the data up to and including the separator, or what is left
+        if the stream ends first.
+
+        This method is a coroutine.
+        """
+        start = 0
+        while True:
+            i = self.buffer.find(separator, start)
+            if i >= 0:
+                i += len(separator)
+                data = self.buffer[:i]
+                self.buffer = self.buffer[i:]
+                return data
+            if max_length is not None and len(self.buffer) > max_length:
+                raise ValueError('request too long')
+            start = max(0, len(self.buffer) - len(separator) + 1)
+            data = await self.stream.read(self.buffer_size)
+            if not data:
+                data = self.buffer
+                self.buffer = b''
+                return data
+            self.buffer += data
+
+    async def read_head(self, max_length=None):
+        """Return the data up to and including the first empty line, with
+        ``\\r\\n`` or bare ``\\n`` line endings, or what is left if the
+        stream ends first.
+
+        This method is a coroutine.
+        """
+        start = 0
+        while True:
+            buf = self.buffer
+            # the line break ending the last line, then the empty line
+            i = buf.find(b'\n\n', start)
+            j = buf.find(b'\n\r\n', start)
+            if j >= 0 and (i < 0 or j < i):
+                i = j + 3
+            elif i >= 0:
+                i += 2
+            if i >= 0:
+                self.buffer = buf[i:]
+                return buf[:i]
+            if max_length is not None and len(buf) > max_length:
+                raise ValueError('request too long')
+            start = max(0, len(buf) - 2)
+            data = await self.stream.read(self.buffer_size)
+            if not data:
+                self.buffer = b''
+                return buf
+            self.buffer = buf + data
+
+    async def readline(self):
+        return await self.read_until(b'\n')
+
+    async def read(self, n=-1):
+        if not self.buffer:
+            return await self.stream.read(n)
+        if n < 0:
+            data = self.buffer + await self.stream.read(n)
+            self.buffer = b''
+            return data
+        data = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return data
+
+    async def readexactly(self, n):
+        data = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        if len(data) < n:
+            data += await self.stream.readexactly(n - len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
 def mro(cls):  # pragma: no cover
     """Return the method resolution order of a class.
 
@@ -327,9 +624,26 @@ class Request:
     #:    Request.max_readline = 16 * 1024  # 16KB lines allowed
     max_readline = 2 * 1024
 
+    #: Specify the maximum length allowed for the request line and headers
+    #: together. Requests with more will not be correctly interpreted.
+    #: Applications can change this maximum as necessary.
+    #:
+    #: Example::
+    #:
+    #:    Request.max_header_length = 16 * 1024  # 16KB of headers allowed
+    max_header_length = 4 * 1024
+
     class G:
         pass
 
+    # without an instance dictionary requests take less memory, where the
+    # runtime supports it
+    __slots__ = ('app', 'client_addr', 'method', 'url', 'url_prefix',
+                 'subapp', 'path', 'query_string', 'headers',
+                 'content_length', 'http_version', 'url_args', 'body_used',
+                 'sock', '_g', '_args', '_cookies', '_content_type', '_body',
+                 '_stream', '_json', '_form', '_after_request_handlers')
+
     def __init__(self, app, client_addr, method, url, http_version, headers,
                  body=None, stream=None, sock=None, url_prefix='',
                  subapp=None):
@@ -351,34 +665,21 @@ class Request:
         self.path = url
         #: The query string portion of the URL.
         self.query_string = None
-        #: The parsed query string, as a
-        #: :class:`MultiDict <microdot.MultiDict>` object.
-        self.args = {}
         #: A dictionary with the headers included in the request.
         self.headers = headers
-        #: A dictionary with the cookies included in the request.
-        self.cookies = {}
         #: The parsed ``Content-Length`` header.
-        self.content_length = 0
-        #: The parsed ``Content-Type`` header.
-        self.content_type = None
-        #: A general purpose container for applications to store data during
-        #: the life of the request.
-        self.g = Request.G()
+        self.content_length = int(headers.get('Content-Length', 0))
+        self.url_args = None
 
         self.http_version = http_version
         if '?' in self.path:
             self.path, self.query_string = self.path.split('?', 1)
-            self.args = self._parse_urlencoded(self.query_string)
 
-        if 'Content-Length' in self.headers:
-            self.content_length = int(self.headers['Content-Length'])
-        if 'Content-Type' in self.headers:
-            self.content_type = self.headers['Content-Type']
-        if 'Cookie' in self.headers:
-            for cookie in self.headers['Cookie'].split(';'):
-                name, value = cookie.strip().split('=', 1)
-                self.cookies[name] = value
+        # the query string, cookies and content type are parsed on first use
+        self._args = None
+        self._cookies = None
+        self._content_type = False
+        self._g = None
 
         self._body = body
         self.body_used = False
@@ -386,7 +687,62 @@ class Request:
         self.sock = sock
         self._json = None
         self._form = None
-        self.after_request_handlers = []
+        self._after_request_handlers = None
+
+    @property
+    def g(self):
+        """A general purpose container for applications to store data during
+        the life of the request."""
+        if self._g is None:
+            self._g = Request.G()
+        return self._g
+
+    @property
+    def after_request_handlers(self):
+        """The request-specific after request handlers."""
+        if self._after_request_handlers is None:
+            self._after_request_handlers = []
+        return self._after_request_handlers
+
+    @property
+    def args(self):
+        """The parsed query string, as a
+        :class:`MultiDict <microdot.MultiDict>` object."""
+        if self._args is None:
+            self._args = self._parse_urlencoded(self.query_string) \
+                if self.query_string else MultiDict()
+        return self._args
+
+    @args.setter
+    def args(self, value):
+        self._args = value
+
+    @property
+    def cookies(self):
+        """A dictionary with the cookies included in the request."""
+        if self._cookies is None:
+            self._cookies = {}
+            cookies = self.headers.get('Cookie')
+            if cookies:
+                for cookie in cookies.split(';'):
+                    name, value = cookie.strip().split('=', 1)
+                    self._cookies[name] = value
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value):
+        self._cookies = value
+
+    @property
+    def content_type(self):
+        """The parsed ``Content-Type`` header."""
+        if self._content_type is False:
+            self._content_type = self.headers.get('Content-Type')
+        return self._content_type
+
+    @content_type.setter
+    def content_type(self, value):
+        self._content_type = value
 
     @staticmethod
     async def create(app, client_reader, client_writer, client_addr):
@@ -402,26 +758,30 @@ class Request:
         This method is a coroutine. It returns a newly created ``Request``
         object.
         """
-        # request line
-        line = (await Request._safe_readline(client_reader)).strip().decode()
-        if not line:  # pragma: no cover
-            return None
-        method, url, http_version = line.split()
-        http_version = http_version.split('/', 1)[1]
+        if not isinstance(client_reader, BufferedStream):
+            client_reader = BufferedStream(client_reader)
 
-        # headers
-        headers = NoCaseDict()
-        content_length = 0
+        # request line and headers, read in one go and only indexed here
         while True:
-            line = (await Request._safe_readline(
-                client_reader)).strip().decode()
-            if line == '':
+            head = await client_reader.read_head(Request.max_header_length)
+            # empty lines between requests are allowed
+            request = head.lstrip(b'\r\n')
+            if request or not head:
                 break
-            header, value = line.split(':', 1)
-            value = value.strip()
-            headers[header] = value
-            if header.lower() == 'content-length':
-                content_length = int(value)
+        if not request:  # pragma: no cover
+            return None
+        if not request.endswith(b'\n\n') and \
+                not request.endswith(b'\n\r\n'):  # pragma: no cover
+            raise ValueError('incomplete request')
+        line_end = request.find(b'\n')
+        if line_end > Request.max_readline:  # pragma: no cover
+            raise ValueError('line too long')
+        method, url, http_version = request[:line_end].decode().split()
+        http_version = http_version.split('/', 1)[1]
+        # the header lines without the empty line that ends them
+        headers = RequestHeaders(request[
+            line_end + 1:-2 if request.endswith(b'\r\n') else -1])
+        content_length = int(headers.get('Content-Length', 0))
 
         # body
         body = b''
@@ -515,13 +875,6 @@ class Request:
         self.after_request_handlers.append(f)
         return f
 
-    @staticmethod
-    async def _safe_readline(stream):
-        line = (await stream.readline())
-        if len(line) > Request.max_readline:
-            raise ValueError('line too long')
-        return line
-
 
 class Response:
     """An HTTP response class.
@@ -551,6 +904,10 @@ class Response:
 
     send_file_buffer_size = 1024
 
+    #: Bodies up to this size are sent in the same write as the status line
+    #: and headers, larger ones in a separate write.
+    max_coalesced_body_length = 1024
+
     #: The content type to use for responses that do not explicitly define a
     #: ``Content-Type`` header.
     default_content_type = 'text/plain'
@@ -563,12 +920,15 @@ class Response:
     #: written to the client. Used to exit WebSocket connections cleanly.
     already_handled = None
 
+    __slots__ = ('status_code', 'headers', 'reason', 'body', 'is_head',
+                 'http_version', 'keep_alive')
+
     def __init__(self, body='', status_code=200, headers=None, reason=None):
         if body is None and status_code == 200:
             body = ''
             status_code = 204
         self.status_code = status_code
-        self.headers = NoCaseDict(headers or {})
+        self.headers = Headers(headers)
         self.reason = reason
         if isinstance(body, (dict, list)):
             self.body = json.dumps(body).encode()
@@ -579,6 +939,12 @@ class Response:
             # this applies to bytes, file-like objects or generators
             self.body = body
         self.is_head = False
+        #: The HTTP version used in the status line, set by the server to
+        #: match the request.
+        self.http_version = '1.0'
+        #: Whether the connection stays open after this response, set by
+        #: the server.
+        self.keep_alive = False
 
     def set_cookie(self, cookie, value, path=None, domain=None, expires=None,
                    max_age=None, secure=False, http_only=False,
@@ -631,13 +997,21 @@ class Response:
                         max_age=0, **kwargs)
 
     def complete(self):
-        if isinstance(self.body, bytes) and \
+        if isinstance(self.body, (bytes, bytearray)) and \
                 'Content-Length' not in self.headers:
             self.headers['Content-Length'] = str(len(self.body))
         if 'Content-Type' not in self.headers:
             self.headers['Content-Type'] = self.default_content_type
             if 'charset=' not in self.headers['Content-Type']:
                 self.headers['Content-Type'] += '; charset=UTF-8'
+        if self.keep_alive:
+            if 'Content-Length' not in self.headers:
+                # streamed body of unknown length
+                self.headers['Transfer-Encoding'] = 'chunked'
+            if self.http_version == '1.0':
+                self.headers['Connection'] = 'keep-alive'
+        elif self.http_version != '1.0':
+            self.headers['Connection'] = 'close'
 
     async def write(self, stream):
         self.complete()
@@ -646,23 +1020,36 @@ class Response:
             # status code
             reason = self.reason if self.reason is not None else \
                 ('OK' if self.status_code == 200 else 'N/A')
-            await stream.awrite('HTTP/1.0 {status_code} {reason}\r\n'.format(
-                status_code=self.status_code, reason=reason).encode())
+            lines = ['HTTP/', self.http_version, ' ', str(self.status_code),
+                     ' ', reason, '\r\n']
 
             # headers
             for header, value in self.headers.items():
                 values = value if isinstance(value, list) else [value]
                 for value in values:
-                    await stream.awrite('{header}: {value}\r\n'.format(
-                        header=header, value=value).encode())
-            await stream.awrite(b'\r\n')
-
-            # body
-            if not self.is_head:
+                    lines.extend((header, ': ', str(value), '\r\n'))
+            lines.append('\r\n')
+            head = ''.join(lines).encode()
+
+            # the header block goes out in one write, together with the body
+            # when it is small enough
+            if self.is_head:
+                await stream.awrite(head)
+            elif isinstance(self.body, (bytes, bytearray)) and \
+                    len(self.body) <= self.max_coalesced_body_length:
+                await stream.awrite(head + self.body)
+            else:
+                await stream.awrite(head)
+                chunked = self.headers.get('Transfer-Encoding') == 'chunked'
                 iter = self.body_iter()
                 async for body in iter:
                     if isinstance(body, str):  # pragma: no cover
                         body = body.encode()
+                    if chunked:
+                        if not body:
+                            # an empty chunk would end the body
+                            continue
+                        body = b'%x\r\n' % len(body) + body + b'\r\n'
                     try:
                         await stream.awrite(body)
                     except OSError as exc:  # pragma: no cover
@@ -673,6 +1060,8 @@ class Response:
                         raise
                 if hasattr(iter, 'aclose'):  # pragma: no branch
                     await iter.aclose()
+                if chunked:
+                    await stream.awrite(b'0\r\n\r\n')
 
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS or \
@@ -806,6 +1195,140 @@ class Response:
         return cls(body=f, status_code=status_code, headers=headers)
 
 
+class FixedResponse(Response):
+    """A response with a fixed status code, headers and body size, which is
+    rendered once into a buffer and reused for every request.
+
+    :param body_size: The size of the body in bytes.
+    :param headers: A dictionary with the headers that never change.
+    :param fields: A dictionary with the names of the headers that change
+                   from one response to the next, and the largest number of
+                   characters their values can have. Shorter values are
+                   padded with trailing spaces.
+    :param status_code: The numeric HTTP status code.
+    :param reason: A custom reason phrase to add after the status code.
+
+    Update the variable headers with :meth:`set_int` and write the body into
+    :attr:`body_view`, then return the response from the route. Nothing is
+    allocated per request and the whole response goes out in a single write.
+
+    The buffer is shared by all requests, so the body and headers must be
+    filled in without awaiting in between. A response that is written after
+    another request filled in the buffer sends the newer contents. On
+    CPython the buffer is copied for every write, as the transport can send
+    it after the next request has already changed it.
+
+    Example::
+
+        counter_response = FixedResponse(
+            4, {'Content-Type': 'application/octet-stream'}, {'X-Count': 10})
+
+        @app.route('/counter')
+        async def counter(request):
+            counter_response.set_int('X-Count', count)
+            struct.pack_into('<I', counter_response.body_view, 0, count)
+            return counter_response
+    """
+    __slots__ = ('fields', 'buffer', 'head_view', 'body_view', 'view')
+
+    def __init__(self, body_size, headers=None, fields=None, status_code=200,
+                 reason=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = Headers(headers)
+        self.is_head = False
+        self.headers['Content-Length'] = str(body_size)
+        if 'Content-Type' not in self.headers:
+            self.headers['Content-Type'] = self.default_content_type + \
+                '; charset=UTF-8'
+        if reason is None:
+            reason = 'OK' if status_code == 200 else 'N/A'
+        head = 'HTTP/1.0 {status_code} {reason}\r\n'.format(
+            status_code=status_code, reason=reason)
+        for header, value in self.headers.items():
+            head += '{header}: {value}\r\n'.format(header=header, value=value)
+        self.http_version = '1.0'
+        self.keep_alive = False
+        self.fields = {}
+        # the version in the status line and the Connection header are
+        # patched in before every write
+        fields = dict(fields or {}, Connection=10)
+        for header, width in fields.items():
+            head += header + ': '
+            self.fields[header] = (len(head), width)
+            head += ' ' * width + '\r\n'
+        head = (head + '\r\n').encode()
+        self.buffer = bytearray(len(head) + body_size)
+        self.buffer[:len(head)] = head
+        view = memoryview(self.buffer)
+        self.head_view = view[:len(head)]
+        #: A ``memoryview`` of the body, for the route to write into.
+        self.body = self.body_view = view[len(head):]
+        self.view = view
+
+    def set_int(self, header, value):
+        """Write an integer into one of the variable headers.
+
+        :param header: The header name, as given in ``fields``.
+        :param value: The integer value.
+        """
+        offset, width = self.fields[header]
+        buf = self.buffer
+        end = offset + width
+        if value < 0:
+            buf[offset] = 45  # '-'
+            offset += 1
+            value = -value
+        # count the digits, then write them right to left
+        n = 1
+        v = value
+        while v >= 10:
+            v //= 10
+            n += 1
+        if offset + n > end:
+            raise ValueError('Value too wide for header ' + header)
+        i = offset + n
+        while i > offset:
+            i -= 1
+            buf[i] = 48 + value % 10
+            value //= 10
+        for i in range(offset + n, end):
+            buf[i] = 32
+
+    def set_bytes(self, header, value):
+        """Write a bytes value into one of the variable headers.
+
+        :param header: The header name, as given in ``fields``.
+        :param value: The value, as bytes.
+        """
+        offset, width = self.fields[header]
+        n = len(value)
+        if n > width:
+            raise ValueError('Value too wide for header ' + header)
+        buf = self.buffer
+        for i in range(n):
+            buf[offset + i] = value[i]
+        for i in range(offset + n, offset + width):
+            buf[i] = 32
+
+    async def write(self, stream):
+        # HTTP/1.x
+        self.buffer[7] = 48 if self.http_version == '1.0' else 49
+        self.set_bytes('Connection',
+                       b'keep-alive' if self.keep_alive else b'close')
+        view = self.head_view if self.is_head else self.view
+        if COPY_SHARED_BUFFERS:
+            view = bytes(view)
+        try:
+            await stream.awrite(view)
+        except OSError as exc:  # pragma: no cover
+            if exc.errno in MUTED_SOCKET_ERRORS or \
+                    exc.args[0] == 'Connection lost':
+                pass
+            else:
+                raise
+
+
 class URLPattern():
     segment_patterns = {
         'string': '/([^/]+)',
@@ -906,6 +1429,15 @@ class Microdot:
         self.options_handler = self.default_options_handler
         self.debug = False
         self.server = None
+        #: Seconds an idle persistent connection is kept open waiting for
+        #: the next request.
+        self.keep_alive_timeout = 10
+        #: Number of recently requested paths for which the matching routes
+        #: are remembered.
+        self.route_cache_size = 32
+        self._route_index = None
+        self._route_cache = {}
+        self._handler_chains = {}
 
     def route(self, url_pattern, methods=None):
         """Decorator that is used to register a function as a request handler
@@ -1298,40 +1830,136 @@ class Microdot:
         f = 404
         p = ''
         s = None
-        for route_methods, route_pattern, route_handler, url_prefix, subapp \
-                in self.url_map:
-            req.url_args = route_pattern.match(req.path)
-            if req.url_args is not None:
-                p = url_prefix
-                s = subapp
-                if method in route_methods:
-                    f = route_handler
-                    break
-                else:
-                    f = 405
+        req.url_args = None
+        for route, url_args in self.match_routes(req.path):
+            route_methods, _, route_handler, url_prefix, subapp = route
+            # the cached arguments are shared, handlers get their own copy
+            req.url_args = dict(url_args)
+            p = url_prefix
+            s = subapp
+            if method in route_methods:
+                f = route_handler
+                break
+            else:
+                f = 405
         return f, p, s
 
+    def match_routes(self, path):
+        """Return the routes that match a path, in the order in which they
+        were registered, as a list of ``(route, url_args)`` tuples.
+
+        :param path: The path portion of the request URL.
+
+        Only the routes that can match, found through an index of the URL
+        map, are tested against the path, and the results for recently
+        requested paths are cached. The returned list and ``url_args``
+        dictionaries are shared by all the requests for the path and must
+        not be modified.
+        """
+        if self._route_index is None or \
+                self._route_index[0] != len(self.url_map):
+            # routes were added or mounted, this also empties the cache
+            self._build_route_index()
+        matches = self._route_cache.get(path)
+        if matches is not None:
+            return matches
+        _, static, node = self._route_index
+        # exact static paths, plus the routes with parameters whose static
+        # leading segments are a prefix of the path
+        candidates = list(static.get(path, ()))
+        candidates.extend(node[1])
+        if path.startswith('/'):
+            for segment in path[1:].split('/'):
+                node = node[0].get(segment)
+                if node is None:
+                    break
+                candidates.extend(node[1])
+        candidates.sort()
+        matches = []
+        for i in candidates:
+            route = self.url_map[i]
+            url_args = route[1].match(path)
+            if url_args is not None:
+                matches.append((route, url_args))
+        if len(self._route_cache) >= self.route_cache_size:
+            self._route_cache.clear()
+        self._route_cache[path] = matches
+        return matches
+
+    def _build_route_index(self):
+        # static paths map to a list of route positions in the URL map, the
+        # rest go into a trie of their static leading segments, in which
+        # each node is a (children, route positions) tuple
+        static = {}
+        root = ({}, [])
+        for i, route in enumerate(self.url_map):
+            url_pattern = route[1].url_pattern
+            segments = url_pattern.lstrip('/').split('/')
+            if '<' not in url_pattern and not any(
+                    c in url_pattern for c in '.^$*+?{}[]\\|()'):
+                static.setdefault('/' + '/'.join(segments), []).append(i)
+                continue
+            node = root
+            for segment in segments:
+                if segment.startswith('<') or any(
+                        c in segment for c in '.^$*+?{}[]\\|()'):
+                    break
+                node = node[0].setdefault(segment, ({}, []))
+            node[1].append(i)
+        self._route_index = (len(self.url_map), static, root)
+        self._route_cache = {}
+
     def default_options_handler(self, req):
         allow = []
-        for route_methods, route_pattern, _, _, _ in self.url_map:
-            if route_pattern.match(req.path) is not None:
-                allow.extend(route_methods)
+        for route, _ in self.match_routes(req.path):
+            allow.extend(route[0])
         if 'GET' in allow:
             allow.append('HEAD')
         allow.append('OPTIONS')
         return {'Allow': ', '.join(allow)}
 
     async def handle_request(self, reader, writer):
-        req = None
-        try:
-            req = await Request.create(self, reader, writer,
-                                       writer.get_extra_info('peername'))
-        except Exception as exc:  # pragma: no cover
-            print_exception(exc)
-
-        res = await self.dispatch_request(req)
-        if res != Response.already_handled:  # pragma: no branch
-            await res.write(writer)
+        # the buffer is kept for the whole connection, it may already hold
+        # the start of the next request
+        reader = BufferedStream(reader)
+        first = True
+        while True:
+            req = None
+            try:
+                if first:
+                    req = await Request.create(
+                        self, reader, writer,
+                        writer.get_extra_info('peername'))
+                else:
+                    # persistent connection, wait for the next request
+                    req = await asyncio.wait_for(Request.create(
+                        self, reader, writer,
+                        writer.get_extra_info('peername')),
+                        self.keep_alive_timeout)
+                    if req is None:
+                        # closed by the client
+                        break
+            except (asyncio.TimeoutError, OSError):
+                if not first:
+                    break
+            except Exception as exc:  # pragma: no cover
+                print_exception(exc)
+            first = False
+
+            res = await self.dispatch_request(req)
+            keep_alive = False
+            if res != Response.already_handled:  # pragma: no branch
+                keep_alive = self.keep_alive(req, res)
+                res.http_version = '1.0' \
+                    if req is None or req.http_version == '1.0' else '1.1'
+                res.keep_alive = keep_alive
+                await res.write(writer)
+            if self.debug and req:  # pragma: no cover
+                print('{method} {path} {status_code}'.format(
+                    method=req.method, path=req.path,
+                    status_code=res.status_code))
+            if not keep_alive:
+                break
         try:
             await writer.aclose()
         except OSError as exc:  # pragma: no cover
@@ -1339,18 +1967,93 @@ class Microdot:
                 pass
             else:
                 raise
-        if self.debug and req:  # pragma: no cover
-            print('{method} {path} {status_code}'.format(
-                method=req.method, path=req.path,
-                status_code=res.status_code))
+
+    def keep_alive(self, req, res):
+        """Decide if the connection stays open for another request after
+        sending a response. HTTP/1.1 connections are persistent unless the
+        client asks to close them, HTTP/1.0 ones only when the client sends
+        ``Connection: keep-alive`` and the length of the body is known.
+        """
+        if req is None or self.shutdown_requested:
+            return False
+        if req.content_length > Request.max_body_length:
+            # the body wasn't read, the next request can't be found
+            return False
+        connection = req.headers.get('Connection', '').lower()
+        if req.http_version == '1.0':
+            return 'keep-alive' in connection and \
+                (isinstance(res.body, (bytes, bytearray)) or
+                 'Content-Length' in res.headers)
+        return 'close' not in connection
+
+    def handler_chains(self, subapp=None):
+        """Return the lists of before request, after request and after error
+        request handlers that apply to the endpoints of a mounted
+        sub-application, or of the application itself when ``subapp`` is
+        ``None``, in the order in which they run.
+
+        The lists are built on first use and reused for every request, until
+        the number of handlers of the application or the sub-application
+        changes, so handlers appended directly to the handler lists are
+        picked up as well.
+        """
+        sizes = (len(self.before_request_handlers),
+                 len(self.after_request_handlers),
+                 len(self.after_error_request_handlers))
+        if subapp:
+            sizes += (len(subapp.before_request_handlers),
+                      len(subapp.after_request_handlers),
+                      len(subapp.after_error_request_handlers))
+        cached = self._handler_chains.get(subapp)
+        if cached is None or cached[0] != sizes:
+            cached = (sizes, (
+                self.get_request_handlers(subapp, 'before_request', False),
+                self.get_request_handlers(subapp, 'after_request', True),
+                self.get_request_handlers(
+                    subapp, 'after_error_request', True)))
+            self._handler_chains[subapp] = cached
+        return cached[1]
 
     def get_request_handlers(self, req, attr, local_first=True):
         handlers = getattr(self, attr + '_handlers')
-        local_handlers = getattr(req.subapp, attr + '_handlers') \
-            if req and req.subapp else []
+        # a request, or the sub-application itself
+        subapp = req.subapp if isinstance(req, Request) else req
+        local_handlers = getattr(subapp, attr + '_handlers') \
+            if subapp else []
         return local_handlers + handlers if local_first \
             else handlers + local_handlers
 
+    @staticmethod
+    def make_response(res):
+        """Turn the value returned by a route into a :class:`Response`.
+
+        :param res: An integer status code, a tuple with a body, status code
+                    and headers, or a body.
+        """
+        if isinstance(res, int):
+            # an integer response is taken as a status code with an empty
+            # body
+            res = '', res
+        if isinstance(res, tuple):
+            # handle a tuple response
+            if isinstance(res[0], int):
+                # a tuple that starts with an int has an empty body
+                res = ('', res[0], res[1] if len(res) > 1 else {})
+            body = res[0]
+            if isinstance(res[1], int):
+                # extract the status code and headers (if available)
+                status_code = res[1]
+                headers = res[2] if len(res) > 2 else {}
+            else:
+                # if the status code is missing, assume 200
+                status_code = 200
+                headers = res[1]
+            res = Response(body, status_code, headers)
+        elif not isinstance(res, Response):
+            # any other response types are wrapped in a Response object
+            res = Response(res)
+        return res
+
     async def error_response(self, req, status_code, reason=None):
         if req and req.subapp and status_code in req.subapp.error_handlers:
             return await invoke_handler(
@@ -1368,13 +2071,14 @@ class Microdot:
             else:
                 # find the route in the app's URL map
                 f, req.url_prefix, req.subapp = self.find_route(req)
+                before_request_handlers, after_request_handlers, _ = \
+                    self.handler_chains(req.subapp)
 
                 try:
                     res = None
                     if callable(f):
                         # invoke the before request handlers
-                        for handler in self.get_request_handlers(
-                                req, 'before_request', False):
+                        for handler in before_request_handlers:
                             res = await invoke_handler(handler, req)
                             if res:
                                 break
@@ -1383,40 +2087,20 @@ class Microdot:
                         if res is None:
                             res = await invoke_handler(f, req, **req.url_args)
 
-                        # process the response
-                        if isinstance(res, int):
-                            # an integer response is taken as a status code
-                            # with an empty body
-                            res = '', res
-                        if isinstance(res, tuple):
-                            # handle a tuple response
-                            if isinstance(res[0], int):
-                                # a tuple that starts with an int has an empty
-                                # body
-                                res = ('', res[0],
-                                       res[1] if len(res) > 1 else {})
-                            body = res[0]
-                            if isinstance(res[1], int):
-                                # extract the status code and headers (if
-                                # available)
-                                status_code = res[1]
-                                headers = res[2] if len(res) > 2 else {}
-                            else:
-                                # if the status code is missing, assume 200
-                                status_code = 200
-                                headers = res[1]
-                            res = Response(body, status_code, headers)
-                        elif not isinstance(res, Response):
-                            # any other response types are wrapped in a
-                            # Response object
+                        # process the response, ready responses and
+                        # plain bodies need no normalisation
+                        if isinstance(res, Response):
+                            pass
+                        elif isinstance(res, (bytes, str)):
                             res = Response(res)
+                        else:
+                            res = self.make_response(res)
 
                         # invoke the after request handlers
-                        for handler in self.get_request_handlers(
-                                req, 'after_request', True):
+                        for handler in after_request_handlers:
                             res = await invoke_handler(
                                 handler, req, res) or res
-                        for handler in req.after_request_handlers:
+                        for handler in req._after_request_handlers or ():
                             res = await invoke_handler(
                                 handler, req, res) or res
                         after_request_handled = True
@@ -1475,8 +2159,8 @@ class Microdot:
         if not after_request_handled:
             # if the request did not finish due to an error, invoke the after
             # error request handler
-            for handler in self.get_request_handlers(
-                    req, 'after_error_request', True):
+            for handler in self.handler_chains(
+                    req.subapp if req else None)[2]:
                 res = await invoke_handler(
                     handler, req, res) or res
         res.is_head = (req and req.method == 'HEAD')
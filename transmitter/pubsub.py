@@ -0,0 +1,64 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)"""
+
+class Publisher():
+    """Encodes every new sample once per format and hands the same bytes to
+    all subscribers, so the cost per subscriber is one send.
+
+    encoders maps format names to functions taking a sample and returning
+    the encoded bytes. Formats are only encoded when somebody asks for
+    them."""
+
+    def __init__(self, sampler, encoders):
+        self.sampler = sampler
+        self.encoders = encoders
+        self._seq = None
+        self._cache = {}
+
+    def get(self, format):
+        """The latest sample in the given format"""
+        state = self.sampler.latest
+        if state.seq != self._seq:
+            self._seq = state.seq
+            self._cache.clear()
+        data = self._cache.get(format)
+        if data is None:
+            data = self._cache[format] = self.encoders[format](state)
+        return data
+
+    def subscribe(self, format, on_change=False):
+        return Subscription(self, format, on_change)
+
+class Subscription():
+    """Async iterator returning every new sample (or, with on_change, only
+    the ones that differ from the previous) in the given format. Can be
+    used directly as a streaming Microdot response body."""
+
+    def __init__(self, publisher, format, on_change=False):
+        self.publisher = publisher
+        self.format = format
+        self.on_change = on_change
+        self._last = None
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        sampler = self.publisher.sampler
+        while True:
+            await sampler.wait()
+            if self.closed:
+                raise StopAsyncIteration
+            if self.on_change:
+                # compare everything but seq and ticks
+                current = sampler.latest[2:]
+                if current == self._last:
+                    continue
+                self._last = current
+            return self.publisher.get(self.format)
+
+    async def aclose(self):
+        self.closed = True
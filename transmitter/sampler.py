@@ -0,0 +1,248 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)"""
+
+import asyncio
+import _thread
+from array import array
+from collections import namedtuple
+from time import ticks_us, ticks_add, ticks_diff, sleep_us
+
+# Immutable joystick state published by the sampler.
+# seq - sample counter, ticks - ticks_us() at the moment of the sample,
+# button - debounced button state, presses - button presses since start,
+# edges - recent button edges as (pressed, ticks_us) tuples, oldest first
+Snapshot = namedtuple('Snapshot', ('seq', 'ticks', 'X', 'Y', 'button', 'presses', 'edges'))
+# Immutable state of all InputDevice channels, values in declaration order
+Frame = namedtuple('Frame', ('seq', 'ticks', 'values'))
+
+
+class Sampler():
+    """Reads the joystick at a fixed rate in a background task and keeps
+    the latest reading as an immutable Snapshot, so request handlers never
+    touch the ADC themselves. With a rate of 0 there is no background task
+    and the source is only read on demand, through fresh(). Clients waiting
+    for samples then read it themselves, every demand_ms while they wait."""
+
+    def __init__(self, source, rate_hz=200, demand_ms=5):
+        self.source = source
+        self.period_us = 1000000 // rate_hz if rate_hz else 0
+        self.demand_ms = demand_ms
+        self.seq = 0
+        self.latest = self.capture(0, ticks_us())
+        self.active = False
+        # set every time a new sample is published
+        self.updated = asyncio.Event()
+        # set when a sample differs from the previous one, changed_seq is
+        # the sequence number of the last such sample
+        self.changed = asyncio.Event()
+        self.changed_seq = 0
+        # functions called with every published sample
+        self.listeners = []
+
+    def capture(self, seq, ticks):
+        joy = self.source
+        return Snapshot(seq, ticks, joy.X, joy.Y, joy.button, joy.presses,
+                        joy.recent_edges())
+
+    def publish(self, state):
+        # compare everything but seq and ticks
+        changed = state[2:] != self.latest[2:]
+        self.latest = state
+        for listener in self.listeners:
+            listener(state)
+        # wake up everyone waiting for this sample, then re-arm for the next
+        self.updated.set()
+        self.updated.clear()
+        if changed:
+            self.changed_seq = state.seq
+            self.changed.set()
+            self.changed.clear()
+
+    async def wait(self):
+        """Wait for the next sample and return it"""
+        if not self.period_us:
+            # no background task, take a sample unless another waiter
+            # already did within the last demand_ms
+            seq = self.latest.seq
+            while True:
+                await asyncio.sleep(self.demand_ms / 1000)
+                state = self.fresh(self.demand_ms)
+                if state.seq != seq:
+                    return state
+        await self.updated.wait()
+        return self.latest
+
+    async def _wait_changed(self, since):
+        while self.changed_seq <= since:
+            await self.wait()
+
+    async def wait_change(self, since, timeout_ms):
+        """Return the latest sample as soon as the state differs from the
+        one at sequence number since, or after timeout_ms"""
+        if self.changed_seq <= since:
+            waiter = self.changed.wait() if self.period_us else self._wait_changed(since)
+            try:
+                await asyncio.wait_for(waiter, timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+        return self.latest
+
+    def fresh(self, max_age_ms):
+        """Return a sample no older than max_age_ms, reading the source only
+        when the latest one is too old. All requests within the window share
+        one read, and through the Publisher its encoded payload."""
+        if ticks_diff(ticks_us(), self.latest.ticks) > max_age_ms * 1000:
+            self.sample()
+        return self.latest
+
+    def sample(self):
+        self.source.read()
+        self.seq += 1
+        self.publish(self.capture(self.seq, ticks_us()))
+
+    async def loop(self):
+        deadline = ticks_us()
+        while self.active:
+            self.sample()
+            # schedule against a fixed deadline so the rate doesn't drift
+            # with the time spent reading
+            deadline = ticks_add(deadline, self.period_us)
+            delay = ticks_diff(deadline, ticks_us())
+            if delay < 0:
+                # we're late, don't try to catch up with a burst of samples
+                deadline = ticks_us()
+                delay = 0
+            await asyncio.sleep(delay / 1000000)
+
+    def start(self):
+        self.active = True
+        self.sample()
+        if self.period_us:
+            asyncio.create_task(self.loop())
+
+    def stop(self):
+        self.active = False
+
+
+class FrameSampler(Sampler):
+    """Sampler for an InputDevice, publishing Frames with every channel"""
+
+    def capture(self, seq, ticks):
+        return Frame(seq, ticks, tuple(self.source.values))
+
+
+class Handoff():
+    """Seqlock protected buffer of integers for passing samples from one
+    writer thread to readers on the other core without locks.
+
+    The sequence counter is odd while the writer is updating the buffer,
+    readers retry when it was odd or changed while they were copying."""
+
+    def __init__(self, size):
+        self._seq = 0
+        self._buf = array('l', [0] * size)
+
+    def begin(self):
+        """Start a write, returns the buffer to fill"""
+        self._seq = (self._seq + 1) & 0x3FFFFFFF
+        return self._buf
+
+    def commit(self):
+        self._seq = (self._seq + 1) & 0x3FFFFFFF
+
+    def read(self, into):
+        """Copy the latest values into the given array, returns the number
+        of the write they come from"""
+        buf = self._buf
+        while True:
+            seq = self._seq
+            if seq & 1:
+                # write in progress, it's only a few stores so spin
+                continue
+            for i in range(len(buf)):
+                into[i] = buf[i]
+            if self._seq == seq:
+                return seq >> 1
+
+
+class ThreadedSampler(Sampler):
+    """Sampler that reads its source in a separate thread, which on the
+    Pico runs on the second core. Samples are passed through a Handoff,
+    and the asyncio side only picks up the latest one at the sampling
+    rate, so it never waits for the ADC. Works with a Joystick or an
+    InputDevice source, and with CPython threads for testing.
+
+    The Joystick's button edge ring is shared with its pin IRQ and
+    recent_edges() on the first core, and disable_irq() only masks the core
+    it's called on. So the thread only reads the axes, the button is synced
+    and picked up on the asyncio side."""
+
+    def __init__(self, source, rate_hz=200):
+        # frames from InputDevice, snapshots from Joystick
+        self._frames = hasattr(source, 'values')
+        size = 1 + (len(source.values) if self._frames else 2)
+        self.handoff = Handoff(size)
+        self._copy = array('l', [0] * size)
+        self._running = False
+        super().__init__(source, rate_hz)
+
+    def capture(self, seq, ticks):
+        if self._frames:
+            return Frame(seq, ticks, tuple(self.source.values))
+        return super().capture(seq, ticks)
+
+    def _store(self, buf):
+        # runs in the sampling thread, mustn't allocate
+        src = self.source
+        buf[0] = ticks_us()
+        if self._frames:
+            values = src.values
+            for i in range(len(values)):
+                buf[i + 1] = values[i]
+        else:
+            buf[1] = src.X
+            buf[2] = src.Y
+
+    def _thread_loop(self):
+        handoff = self.handoff
+        read = self.source.read
+        frames = self._frames
+        deadline = ticks_us()
+        while self._running:
+            if frames:
+                read()
+            else:
+                read(False)
+            self._store(handoff.begin())
+            handoff.commit()
+            deadline = ticks_add(deadline, self.period_us)
+            delay = ticks_diff(deadline, ticks_us())
+            if delay < 0:
+                deadline = ticks_us()
+            else:
+                sleep_us(delay)
+
+    def sample(self):
+        # runs in the asyncio loop, publishes the latest sample if it's new
+        if not self._frames:
+            self.source._sync_button()
+        seq = self.handoff.read(self._copy)
+        if seq == self.seq:
+            return
+        self.seq = seq
+        buf = self._copy
+        if self._frames:
+            self.publish(Frame(seq, buf[0], tuple(buf[1:])))
+        else:
+            src = self.source
+            self.publish(Snapshot(seq, buf[0], buf[1], buf[2], src.button, src.presses,
+                                  src.recent_edges()))
+
+    def start(self):
+        self._running = True
+        _thread.start_new_thread(self._thread_loop, ())
+        super().start()
+
+    def stop(self):
+        super().stop()
+        self._running = False
@@ -0,0 +1,224 @@
+# CPython checks of the bundled microdot's route index and request parsing,
+# run from this directory with "python test_microdot.py"
+
+import asyncio
+from microdot import Microdot
+from microdot.microdot import RequestHeaders
+
+class Reader():
+    """Input stream returning the given data in chunks of chunk_size bytes"""
+
+    def __init__(self, data, chunk_size=4096):
+        self.data = data
+        self.chunk_size = chunk_size
+
+    async def read(self, n=-1):
+        n = self.chunk_size if n < 0 else min(n, self.chunk_size)
+        data, self.data = self.data[:n], self.data[n:]
+        return data
+
+    async def readexactly(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = await self.read(n - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+class Writer():
+
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    async def awrite(self, data):
+        self.data += bytes(data)
+
+    async def aclose(self):
+        self.closed = True
+
+    def get_extra_info(self, name):
+        return ('127.0.0.1', 1234)
+
+def make_app():
+    app = Microdot()
+
+    @app.route('/')
+    async def index(request):
+        return 'index'
+
+    @app.route('/items', methods=['GET', 'POST'])
+    async def items(request):
+        if request.method == 'POST':
+            return 'posted ' + request.body.decode()
+        return 'items'
+
+    @app.route('/items/<int:id>')
+    async def item(request, id):
+        return 'item {}'.format(id)
+
+    @app.route('/items/<int:id>', methods=['DELETE'])
+    async def delete_item(request, id):
+        return 'deleted {}'.format(id)
+
+    @app.route('/items/<name>')
+    async def item_by_name(request, name):
+        return 'name ' + name
+
+    @app.route('/items/<int:id>/tags/<tag>')
+    async def item_tag(request, id, tag):
+        return 'tag {} {}'.format(id, tag)
+
+    @app.route('/files/<path:path>')
+    async def files(request, path):
+        return 'file ' + path
+
+    @app.route('/hex/<re:[0-9a-f]+:value>')
+    async def hex_value(request, value):
+        return 'hex ' + value
+
+    @app.route('/header')
+    async def header(request):
+        return request.headers.get('X-Test', '-')
+
+    @app.route('/<page>')
+    async def page(request, page):
+        return 'page ' + page
+
+    sub = Microdot()
+
+    @sub.route('/')
+    async def sub_index(request):
+        return 'sub'
+
+    @sub.route('/<int:n>')
+    async def sub_n(request, n):
+        return 'sub {}'.format(n)
+
+    app.mount(sub, url_prefix='/sub')
+    return app
+
+PATHS = ['/', '/items', '/items/', '/items/3', '/items/-3', '/items/abc',
+         '/items/3/tags/x', '/items/3/tags', '/files/a/b/c.txt', '/files',
+         '/hex/ff', '/hex/fg', '/about', '/header', '/sub', '/sub/', '/sub/7',
+         '/sub/x', '/missing/path', '', 'items', '/items//3']
+
+def linear_scan(app, path):
+    matches = []
+    for route in app.url_map:
+        url_args = route[1].match(path)
+        if url_args is not None:
+            matches.append((route, url_args))
+    return matches
+
+def check_route_index():
+    app = make_app()
+    for _ in range(2):
+        # the second round comes from the cache
+        for path in PATHS:
+            assert app.match_routes(path) == linear_scan(app, path), path
+
+    # routes added after the index was built
+    @app.route('/late/<int:n>')
+    async def late(request, n):
+        return 'late'
+
+    for path in PATHS + ['/late/1', '/late/x']:
+        assert app.match_routes(path) == linear_scan(app, path), path
+
+    # a small cache that keeps being emptied
+    app.route_cache_size = 2
+    for path in PATHS * 2:
+        assert app.match_routes(path) == linear_scan(app, path), path
+    print("Route index matches the linear scan")
+
+async def serve(app, data, chunk_size=4096):
+    """Run one connection with the given request bytes, returns the list
+    of (status line, headers, body) of the responses"""
+    writer = Writer()
+    await app.handle_request(Reader(data, chunk_size), writer)
+    assert writer.closed
+    responses = []
+    data = writer.data
+    while data:
+        head, data = data.split(b'\r\n\r\n', 1)
+        lines = head.decode().split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, value = line.split(':', 1)
+            headers[name.lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        responses.append((lines[0], headers, data[:length].decode()))
+        data = data[length:]
+    return responses
+
+def bodies(responses):
+    return [body for _, _, body in responses]
+
+def keeps_alive(response):
+    # the Connection header is only sent when it isn't the default of the
+    # HTTP version
+    status, headers, _ = response
+    default = 'close' if status.startswith('HTTP/1.0') else 'keep-alive'
+    return headers.get('connection', default) == 'keep-alive'
+
+async def check_requests():
+    app = make_app()
+
+    # HTTP/1.0 closes after one response
+    responses = await serve(app, b'GET /items/3 HTTP/1.0\r\n\r\n'
+                                 b'GET / HTTP/1.0\r\n\r\n')
+    assert bodies(responses) == ['item 3'], responses
+    assert responses[0][0] == 'HTTP/1.0 200 OK'
+    assert not keeps_alive(responses[0])
+
+    # pipelined HTTP/1.1 requests in one read, answered in order
+    data = (b'GET /items/3 HTTP/1.1\r\nHost: x\r\n\r\n'
+            b'POST /items HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello'
+            b'DELETE /items/4 HTTP/1.1\r\nHost: x\r\n\r\n'
+            b'GET /sub/7 HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+    expected = ['item 3', 'posted hello', 'deleted 4', 'sub 7']
+    for chunk_size in (4096, 7, 1):
+        # requests, and the empty line ending them, split across reads
+        responses = await serve(app, data, chunk_size)
+        assert bodies(responses) == expected, (chunk_size, responses)
+        assert [keeps_alive(r) for r in responses] == [True] * 3 + [False], responses
+
+    # HTTP/1.0 keep-alive, closed by the client after the second request
+    responses = await serve(app, b'GET /about HTTP/1.0\r\nConnection: keep-alive\r\n\r\n'
+                                 b'GET /files/a/b HTTP/1.0\r\nConnection: keep-alive\r\n\r\n')
+    assert bodies(responses) == ['page about', 'file a/b'], responses
+    assert keeps_alive(responses[0]) and keeps_alive(responses[1])
+
+    # bare LF line endings, empty lines between requests, header lookup
+    data = (b'GET /header HTTP/1.1\nHost: x\nX-Test: lf\n\n'
+            b'\r\n\n'
+            b'GET /header HTTP/1.1\r\nX-Test: crlf\r\n\r\n'
+            b'GET /hex/ff HTTP/1.1\nConnection: close\n\n')
+    for chunk_size in (4096, 2, 1):
+        responses = await serve(app, data, chunk_size)
+        assert bodies(responses) == ['lf', 'crlf', 'hex ff'], (chunk_size, responses)
+
+    # methods and missing routes
+    responses = await serve(app, b'PUT /items/3 HTTP/1.1\r\n\r\n'
+                                 b'GET /missing/path HTTP/1.1\r\nConnection: close\r\n\r\n')
+    assert [r[0] for r in responses] == ['HTTP/1.1 405 N/A', 'HTTP/1.1 404 N/A'], responses
+    print("Pipelined, keep-alive and LF-only requests handled")
+
+def check_headers():
+    for raw in (b'Host: x\r\nX-Test: 1 \r\nx-other: 2\r\n',
+                b'Host: x\nX-Test: 1 \nx-other: 2\n'):
+        headers = RequestHeaders(raw)
+        assert headers.get('x-test') == '1'
+        assert headers['X-Other'] == '2'
+        assert 'Missing' not in headers
+        assert dict(RequestHeaders(raw).items()) == \
+            {'Host': 'x', 'X-Test': '1', 'x-other': '2'}
+    print("Request headers found with CRLF and LF line endings")
+
+
+if __name__ == "__main__":
+    check_route_index()
+    check_headers()
+    asyncio.run(check_requests())
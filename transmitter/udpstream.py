@@ -0,0 +1,71 @@
+""" MIT License
+Copyright (c) 2025 Filip S. (polymentor@proton.me)"""
+
+import asyncio
+import socket
+from time import ticks_ms, ticks_diff
+
+class UdpStreamer():
+    """Pushes the latest joystick state to registered receivers in UDP
+    datagrams at a fixed rate.
+
+    A receiver registers by sending any datagram to the streamer's port,
+    and has to repeat it at least every timeout_ms to keep receiving.
+    Sending b'bye' unregisters it right away."""
+
+    def __init__(self, publisher, format='frame', port=5001, rate_hz=100, timeout_ms=3000):
+        self.publisher = publisher
+        self.format = format
+        self.port = port
+        self.period = 1 / rate_hz
+        self.timeout_ms = timeout_ms
+        # receiver address -> ticks_ms() of its last registration
+        self.receivers = {}
+        self.sock = None
+
+    def _poll_registrations(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(16)
+            except OSError:
+                # nothing more to read
+                break
+            if data == b'bye':
+                if self.receivers.pop(addr, None) is not None:
+                    print("UDP receiver left:", addr)
+            else:
+                if addr not in self.receivers:
+                    print("UDP receiver registered:", addr)
+                self.receivers[addr] = ticks_ms()
+        now = ticks_ms()
+        for addr, last in list(self.receivers.items()):
+            if ticks_diff(now, last) > self.timeout_ms:
+                print("UDP receiver timed out:", addr)
+                del self.receivers[addr]
+
+    async def loop(self):
+        last_seq = None
+        while True:
+            self._poll_registrations()
+            sampler = self.publisher.sampler
+            if self.receivers:
+                # reads the source only when the sampler has no background
+                # task, or it is slower than this stream
+                sampler.fresh(self.period * 1000)
+            seq = sampler.latest.seq
+            if self.receivers and seq != last_seq:
+                last_seq = seq
+                data = self.publisher.get(self.format)
+                for addr in self.receivers:
+                    try:
+                        self.sock.sendto(data, addr)
+                    except OSError:
+                        pass
+            await asyncio.sleep(self.period)
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('0.0.0.0', self.port))
+        self.sock.setblocking(False)
+        asyncio.create_task(self.loop())